@@ -5,16 +5,22 @@ PM2.5 Estimation System - Main Application
 Author: PM2.5 Estimation System
 """
 
-from flask import Flask, render_template, request, jsonify, url_for
+from flask import (Flask, Response, render_template, request, jsonify, url_for,
+                   copy_current_request_context, stream_with_context)
 import os
 from werkzeug.utils import secure_filename
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import traceback
 import json
 import numpy as np
 
 # Import our custom modules
+from batch_analysis import BatchAnalyzer, archive_tiles, MAX_BATCH_TILES
 from image_analysis import ImageAnalyzer
+from image_context import ImageContext
+from feature_cache import FeatureCache
+from job_queue import JobQueue
 from pm25_estimator import PM25Estimator
 from visualization import PM25Visualizer
 
@@ -39,6 +45,11 @@ app.config['SECRET_KEY'] = 'pm25-estimation-secret-key-2026'
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['RESULTS_FOLDER'] = 'static/results'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['PERSIST_UPLOADS'] = True  # Keep a copy of each original upload
+app.config['UNCERTAINTY_BANDS'] = False  # Monte-Carlo PM2.5 bands on every request
+app.config['ANALYZE_JOBS'] = False  # Queue /analyze work by default (mode=job)
+app.config['JOB_WORKERS'] = 2  # Analysis job threads per worker process
+app.config['BATCH_WORKERS'] = None  # /analyze/batch processes per worker (None: CPU count)
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp'}
@@ -48,6 +59,24 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['RESULTS_FOLDER'], exist_ok=True)
 os.makedirs('data', exist_ok=True)
 
+# Background writer so persisting uploads never blocks a request
+upload_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='upload-writer')
+
+# Features and estimates keyed by a hash of the upload; the disk tier
+# is shared by every worker process
+feature_cache = FeatureCache(os.path.join('data', 'feature_cache'))
+
+# Analyses submitted with mode=job; job records are shared between
+# worker processes through the jobs directory
+analysis_jobs = JobQueue(os.path.join('data', 'jobs'), workers=app.config['JOB_WORKERS'])
+
+# Feature extraction pool for /analyze/batch (processes start on first use)
+batch_analyzer = BatchAnalyzer(workers=app.config['BATCH_WORKERS'])
+
+
+class UploadError(ValueError):
+    """An upload that cannot be analyzed (reported as HTTP 400)."""
+
 
 def allowed_file(filename):
     """Check if uploaded file has allowed extension."""
@@ -55,16 +84,265 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def save_upload(filepath, data):
+    """Write uploaded bytes to disk atomically (runs on upload_writer)."""
+    try:
+        temp_path = f"{filepath}.part"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, filepath)
+        print(f"✓ Image saved: {filepath}")
+    except OSError as e:
+        print(f"✗ Failed to save upload {filepath}: {e}")
+
+
+def cached_image_outputs(entry):
+    """Heatmap/before-after filenames of a cache entry that still exist."""
+    outputs = entry.get('images') or {}
+    return {
+        kind: name for kind, name in outputs.items()
+        if name and os.path.exists(os.path.join(app.config['RESULTS_FOLDER'], name))
+    }
+
+
+def chart_mode():
+    """
+    Where the charts of an /analyze request are drawn: 'server' renders
+    PNGs, 'client' returns chart data for the browser to draw instead.
+    """
+    mode = request.form.get('charts', 'server').lower()
+    if mode not in ('server', 'client'):
+        raise ValueError("charts must be 'server' or 'client'")
+    return mode
+
+
 @app.route('/')
 def index():
     """Render the main page."""
     return render_template('index.html')
 
 
+def run_analysis(data, filename, client_charts=False, uncertainty_band=False, report=None):
+    """
+    Run the full analysis pipeline on an uploaded image.
+    
+    Used directly by /analyze and, in job mode, on a job queue worker
+    (inside a copy of the request context, so url_for still works).
+    
+    Args:
+        data: Raw bytes of the uploaded image
+        filename: Client-side file name
+        client_charts: Return chart data instead of rendering chart PNGs
+        uncertainty_band: Add the Monte-Carlo PM2.5 band
+        report: Optional progress callback report(stage, partial_result),
+                called after each stage: 'features', 'estimated', then
+                'chart_data' or 'heatmap', 'before_after', 'timeseries'
+                and 'features_chart' as each visualization is ready
+    
+    Returns:
+        dict: /analyze response data
+    
+    Raises:
+        UploadError: If the image cannot be decoded
+    """
+    cache_key = FeatureCache.key(data)
+    cached = feature_cache.get(cache_key)
+    
+    # The estimator pins one coefficient set for the whole request,
+    # even if a new set is hot-reloaded meanwhile
+    estimator = PM25Estimator()
+    
+    # Cached features are always valid; cached estimates (and the
+    # heatmap drawn from them) only for the same coefficient set
+    estimation_results = None
+    image_outputs = {}
+    heatmap_grid = None
+    if cached is not None and \
+            cached['estimation'].get('coefficient_version') == estimator.coefficient_version:
+        estimation_results = cached['estimation']
+        image_outputs = cached_image_outputs(cached)
+        heatmap_grid = cached.get('heatmap_grid')
+    
+    # Client-side charts replace the heatmap PNG with its JSON grid;
+    # the before/after photo effect is always rendered on the server
+    missing_images = [
+        kind for kind in (('before_after',) if client_charts else ('heatmap', 'before_after'))
+        if kind not in image_outputs
+    ]
+    needs_grid = client_charts and heatmap_grid is None
+    
+    # A resubmitted image skips decoding entirely unless its image
+    # visualizations have been cleaned up since
+    context = None
+    if missing_images or needs_grid:
+        # Decode the upload once, straight from the request body; large
+        # JPEGs are decoded at reduced resolution close to 800x600
+        try:
+            context = ImageContext.from_bytes(data)
+        except ValueError:
+            raise UploadError('Could not decode the uploaded image.')
+    
+    filename = secure_filename(filename)
+    # Microseconds keep output names unique across concurrent requests
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    unique_filename = f"{timestamp}_{filename}"
+    
+    # Persisting the original is optional and happens in the background
+    original_url = None
+    if app.config['PERSIST_UPLOADS']:
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        upload_writer.submit(save_upload, filepath, data)
+        original_url = url_for('static', filename=f'uploads/{unique_filename}')
+    
+    def publish(stage, **partial):
+        """Hand a stage's result to the progress callback, if any."""
+        if report is not None:
+            report(stage, partial)
+    
+    if cached is not None:
+        features = cached['features']
+        print(f"✓ Cache hit {cache_key[:12]}")
+    else:
+        # Step 1: Analyze image to extract atmospheric features
+        print("Analyzing atmospheric features...")
+        # One shared context: gray/LAB/HSV views are built at most once
+        analyzer = ImageAnalyzer(context=context)
+        features = analyzer.analyze(fused=True)
+        print(f"✓ Features extracted: {features}")
+    
+    rounded_features = {
+        'haze_score': float(round(features['haze_score'], 2)),
+        'turbidity': float(round(features['turbidity'], 2)),
+        'visibility': float(round(features['visibility'], 2)),
+        'contrast': float(round(features['contrast'], 2)),
+        'brightness': float(round(features['brightness'], 2)),
+        'saturation': float(round(features['saturation'], 2))
+    }
+    publish('features', features=rounded_features)
+    
+    # Step 2: Estimate PM2.5 from features
+    if estimation_results is None:
+        print("Estimating PM2.5 concentration...")
+        estimation_results = estimator.estimate_with_confidence(features)
+    pm25_value = estimation_results['pm25']
+    print(f"✓ PM2.5 estimated: {pm25_value} µg/m³ "
+          f"(coefficients {estimation_results['coefficient_version']})")
+    
+    # Optional Monte-Carlo uncertainty band (~1 ms)
+    uncertainty = None
+    if uncertainty_band:
+        uncertainty = estimator.estimate_uncertainty(features)
+        print(f"✓ Uncertainty band: {uncertainty['p5']}-{uncertainty['p95']} µg/m³")
+    
+    # The number is ready well before the visualizations
+    summary = {
+        'pm25': float(pm25_value),
+        'confidence': float(estimation_results['confidence']),
+        'aqi_category': estimation_results['aqi_category'],
+        'aqi_color': estimation_results['aqi_color'],
+        'health_advice': estimation_results['health_advice'],
+        'coefficient_version': estimation_results['coefficient_version'],
+        'uncertainty': uncertainty,
+        'features': rounded_features,
+        'analysis_id': cache_key,
+        'cached': cached is not None,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    publish('estimated', **summary)
+    
+    # Step 3: Create visualizations, publishing each one as it is ready
+    print("Generating visualizations...")
+    visualizer = PM25Visualizer(app.config['RESULTS_FOLDER'])
+    
+    images = {
+        'original': original_url,
+        'heatmap': None,
+        'before_after': None,
+        'timeseries': None,
+        'features_chart': None
+    }
+    
+    def result_url(name):
+        return url_for('static', filename=f'results/{name}')
+    
+    # Generate all visualizations, cheapest first
+    vis_timestamp = timestamp
+    chart_data = None
+    if client_charts:
+        if needs_grid:
+            heatmap_grid = visualizer.heatmap_grid(context, pm25_value)
+        
+        # Only the history update happens here; the browser draws
+        dates, pm25_values = visualizer.record_history(pm25_value)
+        chart_data = {
+            'timeseries': visualizer.timeseries_data(dates, pm25_values),
+            'features': visualizer.feature_chart_data(features),
+            'heatmap': heatmap_grid
+        }
+        print("✓ Chart data prepared for client-side rendering")
+        publish('chart_data', chart_data=chart_data)
+    else:
+        if 'heatmap' in missing_images:
+            image_outputs['heatmap'] = f'heatmap_{vis_timestamp}.png'
+            heatmap_path = visualizer.create_heatmap(
+                context, pm25_value, image_outputs['heatmap']
+            )
+            print(f"✓ Heatmap created: {heatmap_path}")
+        images['heatmap'] = result_url(image_outputs['heatmap'])
+        publish('heatmap', images=dict(images))
+    
+    if 'before_after' in missing_images:
+        image_outputs['before_after'] = f'before_after_{vis_timestamp}.png'
+        before_after_path = visualizer.create_before_after(
+            context, image_outputs['before_after']
+        )
+        print(f"✓ Before/After created: {before_after_path}")
+    images['before_after'] = result_url(image_outputs['before_after'])
+    publish('before_after', images=dict(images))
+    
+    if cached is None or missing_images or needs_grid:
+        feature_cache.put(cache_key, {
+            'features': features,
+            'estimation': estimation_results,
+            'images': image_outputs,
+            'heatmap_grid': heatmap_grid
+        })
+    
+    if not client_charts:
+        timeseries_path = visualizer.create_timeseries_graph(
+            pm25_value, output_name=f'timeseries_{vis_timestamp}.png'
+        )
+        print(f"✓ Time series created: {timeseries_path}")
+        images['timeseries'] = result_url(f'timeseries_{vis_timestamp}.png')
+        publish('timeseries', images=dict(images))
+        
+        features_chart_path = visualizer.create_feature_chart(
+            features, output_name=f'features_{vis_timestamp}.png'
+        )
+        print(f"✓ Feature chart created: {features_chart_path}")
+        images['features_chart'] = result_url(f'features_{vis_timestamp}.png')
+        publish('features_chart', images=dict(images))
+    
+    # Prepare response with all results
+    response_data = {
+        'success': True,
+        **summary,
+        'images': images,
+        'charts': 'client' if client_charts else 'server',
+        'chart_data': chart_data
+    }
+    
+    print("✓ Analysis complete!")
+    return response_data
+
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     """
     Handle image upload and perform PM2.5 analysis.
+    
+    With mode=job the analysis is queued and a job id is returned at
+    once (HTTP 202); poll /jobs/<job_id> for status and partial results.
     """
     try:
         # Check if file was uploaded
@@ -81,92 +359,256 @@ def analyze():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type. Please upload an image file.'}), 400
         
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(filepath)
-        
-        print(f"✓ Image saved: {filepath}")
-        
-        # Step 1: Analyze image to extract atmospheric features
-        print("Analyzing atmospheric features...")
-        analyzer = ImageAnalyzer(filepath)
-        features = analyzer.analyze()
-        print(f"✓ Features extracted: {features}")
+        try:
+            client_charts = chart_mode() == 'client'
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Step 2: Estimate PM2.5 from features
-        print("Estimating PM2.5 concentration...")
-        estimator = PM25Estimator()
-        estimation_results = estimator.estimate_with_confidence(features)
-        pm25_value = estimation_results['pm25']
-        print(f"✓ PM2.5 estimated: {pm25_value} µg/m³")
+        mode = request.form.get('mode', 'job' if app.config['ANALYZE_JOBS'] else 'sync').lower()
+        if mode not in ('sync', 'job'):
+            return jsonify({'error': "mode must be 'sync' or 'job'"}), 400
         
-        # Step 3: Create visualizations
-        print("Generating visualizations...")
-        visualizer = PM25Visualizer(app.config['RESULTS_FOLDER'])
+        uncertainty_band = app.config['UNCERTAINTY_BANDS'] or \
+            request.form.get('uncertainty', '').lower() in ('1', 'true', 'on')
+        data = file.read()
         
-        # Generate all visualizations
-        vis_timestamp = timestamp
-        heatmap_path = visualizer.create_heatmap(
-            filepath, pm25_value, f'heatmap_{vis_timestamp}.png'
-        )
-        print(f"✓ Heatmap created: {heatmap_path}")
+        if mode == 'job':
+            job_id = analysis_jobs.submit(
+                copy_current_request_context(run_analysis),
+                data, file.filename, client_charts, uncertainty_band
+            )
+            print(f"✓ Analysis queued as job {job_id}")
+            return jsonify({
+                'job_id': job_id,
+                'status': JobQueue.QUEUED,
+                'status_url': url_for('job_status', job_id=job_id),
+                'events_url': url_for('job_events', job_id=job_id)
+            }), 202
         
-        before_after_path = visualizer.create_before_after(
-            filepath, f'before_after_{vis_timestamp}.png'
-        )
-        print(f"✓ Before/After created: {before_after_path}")
+        try:
+            return jsonify(run_analysis(data, file.filename, client_charts, uncertainty_band))
+        except UploadError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    except Exception as e:
+        print(f"✗ Error during analysis: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            'error': f'Analysis failed: {str(e)}',
+            'details': traceback.format_exc()
+        }), 500
+
+
+@app.route('/estimate', methods=['POST'])
+def estimate():
+    """
+    Estimate-only fast path: PM2.5, confidence and AQI as JSON.
+    
+    Runs feature extraction and estimation only; no visualizations,
+    no history update and no copy of the upload are written. The image
+    is sent as a satellite_image form file or, cheapest, as the raw
+    request body (e.g. Content-Type: image/jpeg). Repeated images are
+    answered from the feature cache without decoding.
+    """
+    try:
+        if 'satellite_image' in request.files:
+            file = request.files['satellite_image']
+            if not allowed_file(file.filename):
+                return jsonify({'error': 'Invalid file type. Please upload an image file.'}), 400
+            data = file.read()
+        else:
+            data = request.get_data(cache=False)
+        if not data:
+            return jsonify({'error': 'No image uploaded'}), 400
         
-        timeseries_path = visualizer.create_timeseries_graph(
-            pm25_value, output_name=f'timeseries_{vis_timestamp}.png'
-        )
-        print(f"✓ Time series created: {timeseries_path}")
+        cache_key = FeatureCache.key(data)
+        cached = feature_cache.get(cache_key)
+        estimator = PM25Estimator()
         
-        features_chart_path = visualizer.create_feature_chart(
-            features, output_name=f'features_{vis_timestamp}.png'
-        )
-        print(f"✓ Feature chart created: {features_chart_path}")
+        if cached is not None:
+            features = cached['features']
+            estimation = cached['estimation']
+            if estimation.get('coefficient_version') != estimator.coefficient_version:
+                estimation = estimator.estimate_with_confidence(features)
+                # Refresh the entry so later hits (here and in /analyze) reuse it;
+                # the heatmap was drawn from the old estimate, the photo was not
+                images = {kind: name for kind, name in (cached.get('images') or {}).items()
+                          if kind != 'heatmap'}
+                feature_cache.put(cache_key, {**cached, 'estimation': estimation,
+                                              'images': images, 'heatmap_grid': None})
+        else:
+            try:
+                context = ImageContext.from_bytes(data)
+            except ValueError:
+                return jsonify({'error': 'Could not decode the uploaded image.'}), 400
+            features = ImageAnalyzer(context=context).analyze(fused=True)
+            estimation = estimator.estimate_with_confidence(features)
+            # Later /analyze uploads of the same image skip decoding too
+            feature_cache.put(cache_key, {'features': features, 'estimation': estimation, 'images': {}})
         
-        # Prepare response with all results
-        response_data = {
-            'success': True,
-            'pm25': float(pm25_value),
-            'confidence': float(estimation_results['confidence']),
-            'aqi_category': estimation_results['aqi_category'],
-            'aqi_color': estimation_results['aqi_color'],
-            'health_advice': estimation_results['health_advice'],
-            'features': {
-                'haze_score': float(round(features['haze_score'], 2)),
-                'turbidity': float(round(features['turbidity'], 2)),
-                'visibility': float(round(features['visibility'], 2)),
-                'contrast': float(round(features['contrast'], 2)),
-                'brightness': float(round(features['brightness'], 2)),
-                'saturation': float(round(features['saturation'], 2))
-            },
-            'images': {
-                'original': url_for('static', filename=f'uploads/{unique_filename}'),
-                'heatmap': url_for('static', filename=f'results/heatmap_{vis_timestamp}.png'),
-                'before_after': url_for('static', filename=f'results/before_after_{vis_timestamp}.png'),
-                'timeseries': url_for('static', filename=f'results/timeseries_{vis_timestamp}.png'),
-                'features_chart': url_for('static', filename=f'results/features_{vis_timestamp}.png')
-            },
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        uncertainty = None
+        if request.args.get('uncertainty', '').lower() in ('1', 'true', 'on'):
+            uncertainty = estimator.estimate_uncertainty(features)
         
-        print("✓ Analysis complete!")
-        return jsonify(response_data)
+        return jsonify({
+            'pm25': float(estimation['pm25']),
+            'confidence': float(estimation['confidence']),
+            'aqi_category': estimation['aqi_category'],
+            'aqi_color': estimation['aqi_color'],
+            'health_advice': estimation['health_advice'],
+            'coefficient_version': estimation['coefficient_version'],
+            'uncertainty': uncertainty,
+            'features': {name: round(float(value), 2) for name, value in features.items()},
+            'analysis_id': cache_key,
+            'cached': cached is not None
+        })
     
     except Exception as e:
-        print(f"✗ Error during analysis: {str(e)}")
+        print(f"✗ Error during estimation: {str(e)}")
         print(traceback.format_exc())
         return jsonify({
-            'error': f'Analysis failed: {str(e)}',
+            'error': f'Estimation failed: {str(e)}',
             'details': traceback.format_exc()
         }), 500
 
 
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Estimate PM2.5 for many tiles in one request.
+    
+    Accepts several satellite_image files and/or ZIP archives of tiles
+    (in satellite_image or archive fields). Features are extracted on a
+    process pool and the response is streamed as NDJSON: one line per
+    tile as it finishes (in completion order, with its input 'index'),
+    then a summary line with "done": true. Only estimates are returned;
+    no images or charts are rendered.
+    """
+    uploads = request.files.getlist('satellite_image') + request.files.getlist('archive')
+    uploads = [upload for upload in uploads if upload.filename]
+    if not uploads:
+        return jsonify({'error': 'No files uploaded'}), 400
+    
+    sources = []
+    for upload in uploads:
+        if upload.filename.lower().endswith('.zip'):
+            try:
+                tiles = archive_tiles(upload.stream, ALLOWED_EXTENSIONS)
+            except ValueError as e:
+                return jsonify({'error': f'{upload.filename}: {e}'}), 400
+            sources.append(tiles)
+        elif allowed_file(upload.filename):
+            sources.append([(upload.filename, upload)])
+        else:
+            return jsonify({'error': f'Invalid file type: {upload.filename}'}), 400
+    
+    def tiles():
+        count = 0
+        for source in sources:
+            for name, data in source:
+                count += 1
+                if count > MAX_BATCH_TILES:
+                    raise ValueError(f'Batch limited to {MAX_BATCH_TILES} tiles')
+                yield name, data if isinstance(data, bytes) else data.read()
+    
+    def stream():
+        results = errors = 0
+        start = datetime.now()
+        try:
+            for result in batch_analyzer.analyze(tiles(), PM25Estimator(), feature_cache):
+                results += 1
+                errors += 'error' in result
+                yield json.dumps(result) + '\n'
+        except Exception as e:
+            # Headers are already sent: report the failure in the stream
+            print(f"✗ Batch analysis failed: {str(e)}")
+            yield json.dumps({'error': f'Batch analysis failed: {str(e)}'}) + '\n'
+        
+        elapsed = (datetime.now() - start).total_seconds()
+        print(f"✓ Batch of {results} tiles analyzed in {elapsed:.2f}s ({errors} failed)")
+        yield json.dumps({'done': True, 'tiles': results, 'errors': errors,
+                          'seconds': round(elapsed, 3)}) + '\n'
+    
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Status of an analysis job.
+    
+    The result holds the estimate as soon as it is available (stage
+    'estimated') and the complete /analyze response once status is 'done'.
+    """
+    job = analysis_jobs.get(job_id) if JobQueue.is_job_id(job_id) else None
+    if job is None:
+        return jsonify({'error': 'Unknown job_id'}), 404
+    
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Server-Sent Events stream of an analysis job.
+    
+    Each stage's result is sent as it completes (event names 'started',
+    'features', 'estimated', 'chart_data' or 'heatmap', 'before_after',
+    'timeseries', 'features_chart'), followed by 'done' with the full
+    /analyze response or 'failed' with an error. Earlier events are
+    replayed to late subscribers.
+    """
+    if not JobQueue.is_job_id(job_id) or analysis_jobs.get(job_id) is None:
+        return jsonify({'error': 'Unknown job_id'}), 404
+    
+    def stream():
+        for event in analysis_jobs.events(job_id):
+            if event is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f"event: {event['stage']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Deliver events through buffering proxies at once
+    })
+
+
+@app.route('/charts/timeseries')
+def timeseries_chart_data():
+    """PM2.5 history and AQI bands for a client-side time series chart."""
+    visualizer = PM25Visualizer(app.config['RESULTS_FOLDER'])
+    return jsonify(visualizer.timeseries_data(*visualizer.load_history()))
+
+
+@app.route('/charts/features/<analysis_id>')
+def features_chart_data(analysis_id):
+    """Feature bar values of an earlier /analyze result."""
+    entry = feature_cache.get(analysis_id) if FeatureCache.is_key(analysis_id) else None
+    if entry is None:
+        return jsonify({'error': 'Unknown analysis_id'}), 404
+    
+    visualizer = PM25Visualizer(app.config['RESULTS_FOLDER'])
+    return jsonify(visualizer.feature_chart_data(entry['features']))
+
+
+@app.route('/charts/heatmap/<analysis_id>')
+def heatmap_chart_data(analysis_id):
+    """
+    Downsampled PM2.5 heatmap grid of an earlier /analyze result.
+    
+    The grid is stored when the analysis used client-side charts.
+    """
+    entry = feature_cache.get(analysis_id) if FeatureCache.is_key(analysis_id) else None
+    if entry is None or not entry.get('heatmap_grid'):
+        return jsonify({'error': 'No heatmap grid for this analysis_id'}), 404
+    
+    return jsonify(entry['heatmap_grid'])
+
+
 @app.route('/about')
 def about():
     """Return information about the system."""
@@ -197,6 +639,8 @@ def health():
     """Health check endpoint."""
     return jsonify({
         'status': 'healthy',
+        'feature_cache': feature_cache.stats(),
+        'coefficient_version': PM25Estimator().coefficient_version,
         'timestamp': datetime.now().isoformat()
     })
 
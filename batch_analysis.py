@@ -0,0 +1,227 @@
+"""
+Batch Analysis Module
+Estimates PM2.5 for many uploaded tiles at once: features are extracted
+on a process pool and results are yielded tile by tile as they finish.
+
+Author: PM2.5 Estimation System
+"""
+
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from feature_cache import FeatureCache
+from image_analysis import ImageAnalyzer
+from image_context import ImageContext
+from pm25_estimator import PM25Estimator
+
+
+# Limits for one batch (ZIP entries are checked before anything is decoded)
+MAX_BATCH_TILES = 1000
+MAX_TILE_BYTES = 16 * 1024 * 1024
+
+
+def _analyze_chunk(tiles: List[Tuple[int, bytes]]) -> List[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    Extract features for a few tiles (runs in a worker process).
+    
+    Uses the same decode and fused feature path as /analyze, so results
+    and cache entries are interchangeable with single uploads.
+    
+    Args:
+        tiles: (index, encoded image bytes) pairs
+    
+    Returns:
+        list: (index, features or None, error message or None) per tile
+    """
+    results = []
+    for index, data in tiles:
+        try:
+            context = ImageContext.from_bytes(data)
+            results.append((index, ImageAnalyzer(context=context).analyze(fused=True), None))
+        except ValueError as e:
+            results.append((index, None, str(e)))
+    
+    return results
+
+
+def archive_tiles(stream, extensions: Iterable[str]) -> Iterator[Tuple[str, bytes]]:
+    """
+    Open a ZIP archive of tiles and iterate over its images lazily.
+    
+    The archive directory is validated immediately (so a bad upload can
+    be rejected before streaming starts); entries are only decompressed
+    as the returned iterator is consumed.
+    
+    Args:
+        stream: Seekable file object holding the ZIP data
+        extensions: Allowed lowercase file extensions, without the dot
+    
+    Returns:
+        iterator: (entry name, image bytes) pairs
+    
+    Raises:
+        ValueError: If the archive is invalid or exceeds the batch limits
+    """
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise ValueError("Not a valid ZIP archive")
+    
+    extensions = tuple(f".{extension}" for extension in extensions)
+    entries = [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and not os.path.basename(info.filename).startswith('.')
+        and not info.filename.startswith('__MACOSX/')
+        and info.filename.lower().endswith(extensions)
+    ]
+    
+    if len(entries) > MAX_BATCH_TILES:
+        raise ValueError(f"Archive holds more than {MAX_BATCH_TILES} tiles")
+    oversized = [info.filename for info in entries if info.file_size > MAX_TILE_BYTES]
+    if oversized:
+        raise ValueError(f"Archive entry too large: {oversized[0]}")
+    
+    def read_entries():
+        with archive:
+            for info in entries:
+                yield info.filename, archive.read(info)
+    
+    return read_entries()
+
+
+class BatchAnalyzer:
+    """
+    Runs tile feature extraction on a lazily started process pool and
+    estimates PM2.5 in the calling process with a single estimator, so
+    a whole batch uses one coefficient set.
+    """
+    
+    # Tiles sent to a worker process per task (amortizes IPC overhead)
+    CHUNK_SIZE = 4
+    
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = CHUNK_SIZE):
+        """
+        Initialize the batch analyzer.
+        
+        Args:
+            workers: Worker processes (defaults to the CPU count)
+            chunk_size: Tiles per worker task
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def _pool(self) -> ProcessPoolExecutor:
+        """Start the worker processes on first use."""
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the web server process runs threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+    
+    def analyze(self, tiles: Iterable[Tuple[str, bytes]],
+                estimator: Optional[PM25Estimator] = None,
+                cache: Optional[FeatureCache] = None) -> Iterator[Dict]:
+        """
+        Estimate PM2.5 for every tile, yielding each result as it is ready.
+        
+        Tiles are read from the iterable only as fast as the pool consumes
+        them, so memory stays bounded for large archives. Results come in
+        completion order; 'index' gives the input position.
+        
+        Args:
+            tiles: (name, encoded image bytes) pairs
+            estimator: Estimator to use (a new one by default)
+            cache: Optional FeatureCache; cached features skip the pool and
+                   new results are stored for later single uploads
+        
+        Yields:
+            dict: index, name, pm25, confidence, aqi_category, aqi_color,
+                  coefficient_version, features and cached; or index,
+                  name and error for tiles that could not be decoded
+        """
+        estimator = estimator or PM25Estimator()
+        names = {}
+        keys = {}
+        pending = set()
+        chunk = []
+        max_pending = 2 * self.workers
+        
+        def finish(index, features, error, cached=False):
+            if error is not None:
+                return {'index': index, 'name': names[index], 'error': error}
+            
+            estimation = estimator.estimate_with_confidence(features)
+            if cache is not None and not cached:
+                cache.put(keys[index], {'features': features, 'estimation': estimation, 'images': {}})
+            
+            return {
+                'index': index,
+                'name': names[index],
+                'pm25': float(estimation['pm25']),
+                'confidence': float(estimation['confidence']),
+                'aqi_category': estimation['aqi_category'],
+                'aqi_color': estimation['aqi_color'],
+                'coefficient_version': estimation['coefficient_version'],
+                'features': {name: round(float(value), 2) for name, value in features.items()},
+                'cached': cached
+            }
+        
+        def collect():
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                try:
+                    chunk_results = future.result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. out of memory): start a fresh pool next time
+                    self.shutdown(wait=False)
+                    raise
+                for index, features, error in chunk_results:
+                    yield finish(index, features, error)
+        
+        for index, (name, data) in enumerate(tiles):
+            names[index] = name
+            if cache is not None:
+                keys[index] = FeatureCache.key(data)
+                entry = cache.get(keys[index])
+                if entry is not None:
+                    yield finish(index, entry['features'], None, cached=True)
+                    continue
+            
+            chunk.append((index, data))
+            if len(chunk) == self.chunk_size:
+                pending.add(self._pool().submit(_analyze_chunk, chunk))
+                chunk = []
+                
+                # Bound the number of tiles held in memory
+                while len(pending) >= max_pending:
+                    yield from collect()
+        
+        if chunk:
+            pending.add(self._pool().submit(_analyze_chunk, chunk))
+        
+        while pending:
+            yield from collect()
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the worker processes, if they were started.
+        
+        Args:
+            wait: Block until running tasks have finished
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -0,0 +1,193 @@
+"""
+Benchmark Module
+Measures request latency of the web endpoints in-process and checks
+the /estimate fast path against its latency targets.
+
+Usage:
+    python benchmark.py [--requests 50] [--compare]
+
+The app runs inside a temporary working directory, so uploads, results,
+history rows and cache entries written during the run never touch the
+project's own data/ and static/ folders. The exit status is 1 when a
+latency target is missed.
+
+Author: PM2.5 Estimation System
+"""
+
+import argparse
+import glob
+import io
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+# Tiles used as request payloads
+DATASET_DIR = os.path.join('datasets_images', 'real', 'delhi')
+
+# Latency targets in milliseconds (in-process, one request at a time)
+LATENCY_TARGETS = {
+    'estimate_raw': {'p50': 25.0, 'p95': 40.0},
+    'estimate_form': {'p50': 30.0, 'p95': 45.0},
+    'estimate_cached': {'p50': 3.0, 'p95': 6.0},
+}
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples.
+    
+    Args:
+        samples: Latencies in milliseconds
+    
+    Returns:
+        dict: p50, p95, max and mean in milliseconds
+    """
+    values = np.asarray(samples)
+    return {
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'max': float(values.max()),
+        'mean': float(values.mean())
+    }
+
+
+def measure(request: Callable[[int], object], count: int, warmup: int = 3) -> List[float]:
+    """
+    Time a request function.
+    
+    Args:
+        request: Called with the request number; must raise on failure
+        count: Number of timed requests
+        warmup: Untimed requests made first
+    
+    Returns:
+        list: Latency of each timed request in milliseconds
+    """
+    for i in range(warmup):
+        request(i)
+    
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        request(warmup + i)
+        samples.append((time.perf_counter() - start) * 1000)
+    
+    return samples
+
+
+def run(count: int = 50, compare: bool = False, dataset: str = DATASET_DIR) -> Dict[str, Dict[str, float]]:
+    """
+    Run every benchmark scenario.
+    
+    Args:
+        count: Timed requests per scenario
+        compare: Also time the full /analyze pipeline for reference
+        dataset: Directory searched recursively for .jpg tiles
+    
+    Returns:
+        dict: Scenario name -> latency summary
+    """
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    tiles = sorted(glob.glob(os.path.join(project_dir, dataset, '**', '*.jpg'), recursive=True))
+    if not tiles:
+        raise ValueError(f"No .jpg tiles found in {dataset}")
+    # Distinct payloads for every cold request (warm-up included)
+    payloads = []
+    for path in tiles[:count + 3]:
+        with open(path, 'rb') as f:
+            payloads.append(f.read())
+    
+    # Import the app from a scratch directory: its folders are relative
+    os.chdir(tempfile.mkdtemp(prefix='pm25_benchmark_'))
+    sys.path.insert(0, project_dir)
+    import app as web
+    from feature_cache import FeatureCache
+    
+    web.app.config['PERSIST_UPLOADS'] = False
+    client = web.app.test_client()
+    
+    def fresh_cache():
+        # Memory-only and large enough that cold scenarios never hit
+        web.feature_cache = FeatureCache(None, capacity=len(payloads) + 8)
+    
+    def check(response):
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    
+    def estimate_raw(i):
+        if i % len(payloads) == 0:
+            fresh_cache()  # Every tile once per cache: always a miss
+        check(client.post('/estimate', data=payloads[i % len(payloads)],
+                          content_type='image/jpeg'))
+    
+    def estimate_form(i):
+        if i % len(payloads) == 0:
+            fresh_cache()
+        check(client.post('/estimate', content_type='multipart/form-data', data={
+            'satellite_image': (io.BytesIO(payloads[i % len(payloads)]), 'tile.jpg')
+        }))
+    
+    def estimate_cached(i):
+        check(client.post('/estimate', data=payloads[0], content_type='image/jpeg'))
+    
+    def analyze(i):
+        if i % len(payloads) == 0:
+            fresh_cache()
+        check(client.post('/analyze', content_type='multipart/form-data', data={
+            'satellite_image': (io.BytesIO(payloads[i % len(payloads)]), 'tile.jpg')
+        }))
+    
+    scenarios = {
+        'estimate_raw': estimate_raw,
+        'estimate_form': estimate_form,
+        'estimate_cached': estimate_cached,
+    }
+    if compare:
+        scenarios['analyze'] = analyze
+    
+    results = {}
+    for name, request in scenarios.items():
+        fresh_cache()
+        results[name] = percentiles(measure(request, count))
+    
+    return results
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description='Benchmark PM2.5 endpoint latency')
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+    parser.add_argument('--compare', action='store_true',
+                        help='Also time the full /analyze pipeline (no target)')
+    parser.add_argument('--dataset', default=DATASET_DIR, help='Directory of .jpg tiles')
+    args = parser.parse_args()
+    
+    results = run(args.requests, args.compare, args.dataset)
+    
+    print(f"\n{'scenario':<18}{'p50':>9}{'p95':>9}{'max':>9}   target (p50/p95 ms)")
+    failed = []
+    for name, summary in results.items():
+        target = LATENCY_TARGETS.get(name)
+        line = f"{name:<18}{summary['p50']:>9.1f}{summary['p95']:>9.1f}{summary['max']:>9.1f}"
+        if target is None:
+            print(f"{line}   -")
+            continue
+        
+        missed = [key for key, limit in target.items() if summary[key] > limit]
+        print(f"{line}   {target['p50']:.0f}/{target['p95']:.0f} {'✗' if missed else '✓'}")
+        if missed:
+            failed.append(name)
+    
+    if failed:
+        print(f"\n✗ Latency targets missed: {', '.join(failed)}")
+        sys.exit(1)
+    print("\n✓ All latency targets met")
+
+
+if __name__ == '__main__':
+    main()
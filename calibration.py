@@ -0,0 +1,454 @@
+"""
+Calibration Module
+Fits the PM25Estimator weights and piecewise correction against
+reference PM2.5 measurements for the Delhi tile splits, and writes a
+versioned coefficient file that the estimator loads.
+
+Usage:
+    python calibration.py --reference data/delhi_reference_pm25.csv
+
+The reference CSV has a `tile` column (tile file name or stem, e.g.
+15_23388_13645) and a `pm25` column in µg/m³. Tile features are cached
+in a columnar .npz file, so re-fitting after the reference data changes
+only re-reads the feature columns.
+
+Author: PM2.5 Estimation System
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from image_analysis import ImageAnalyzer, FEATURE_NAMES
+from pm25_estimator import PM25Estimator, write_coefficient_file
+
+
+# Tile splits produced by datasets_images/split_tiles.py
+DATASET_DIR = os.path.join('datasets_images', 'real', 'delhi')
+SPLITS = ('train', 'val', 'test')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Columnar cache of extracted tile features
+FEATURE_FILE = os.path.join('data', 'calibration_features.npz')
+
+# Estimator weight -> design-matrix column, in column order
+WEIGHT_COLUMNS = (
+    ('base_offset', None),
+    ('haze_weight', 'haze_score'),
+    ('turbidity_weight', 'turbidity'),
+    ('visibility_weight', 'visibility'),
+    ('contrast_weight', 'contrast'),
+    ('brightness_weight', 'brightness'),
+    ('saturation_weight', 'saturation')
+)
+
+
+def _extract_chunk(paths: List[str]) -> Dict[str, np.ndarray]:
+    """Extract features for one chunk of tiles (runs in a worker process)."""
+    return ImageAnalyzer.analyze_batch(paths)
+
+
+def list_tiles(dataset_dir: str = DATASET_DIR) -> List[Tuple[str, str]]:
+    """
+    List every tile of the train/val/test splits.
+    
+    Args:
+        dataset_dir: Directory holding the split folders
+    
+    Returns:
+        list: (path, split) pairs in a stable order
+    """
+    tiles = []
+    for split in SPLITS:
+        split_dir = os.path.join(dataset_dir, split)
+        if not os.path.isdir(split_dir):
+            continue
+        for name in sorted(os.listdir(split_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                tiles.append((os.path.join(split_dir, name), split))
+    
+    return tiles
+
+
+def extract_features(dataset_dir: str = DATASET_DIR,
+                     feature_file: str = FEATURE_FILE,
+                     workers: Optional[int] = None,
+                     chunk_size: int = 32) -> Dict[str, np.ndarray]:
+    """
+    Extract features for every tile, reusing the columnar cache.
+    
+    Only tiles that are new or whose size or modification time changed
+    are analyzed; they are spread over a process pool in chunks that
+    each go through the batched feature kernel.
+    
+    Args:
+        dataset_dir: Directory holding the split folders
+        feature_file: Columnar .npz cache of extracted features
+        workers: Worker processes (defaults to the CPU count)
+        chunk_size: Tiles per worker task
+    
+    Returns:
+        dict: Columns 'path', 'split', 'size', 'mtime_ns' and one per feature
+    """
+    tiles = list_tiles(dataset_dir)
+    if not tiles:
+        raise ValueError(f"No tiles found under {dataset_dir}")
+    
+    paths = np.array([path for path, _ in tiles])
+    stats = [os.stat(path) for path in paths]
+    columns = {
+        'path': paths,
+        'split': np.array([split for _, split in tiles]),
+        'size': np.array([st.st_size for st in stats], dtype=np.int64),
+        'mtime_ns': np.array([st.st_mtime_ns for st in stats], dtype=np.int64)
+    }
+    for name in FEATURE_NAMES:
+        columns[name] = np.full(len(tiles), np.nan)
+    
+    # Reuse cached rows whose file is unchanged
+    cached = load_feature_file(feature_file)
+    if cached is not None:
+        row_of = {path: row for row, path in enumerate(cached['path'])}
+        for index, path in enumerate(paths):
+            row = row_of.get(path)
+            if (row is not None and cached['size'][row] == columns['size'][index]
+                    and cached['mtime_ns'][row] == columns['mtime_ns'][index]):
+                for name in FEATURE_NAMES:
+                    columns[name][index] = cached[name][row]
+    
+    missing = np.flatnonzero(np.isnan(columns[FEATURE_NAMES[0]]))
+    print(f"✓ {len(tiles) - len(missing)} tiles cached, {len(missing)} to analyze")
+    
+    if len(missing):
+        chunks = [missing[start:start + chunk_size] for start in range(0, len(missing), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_extract_chunk, [list(paths[chunk]) for chunk in chunks])
+            for chunk, features in zip(chunks, results):
+                for name in FEATURE_NAMES:
+                    columns[name][chunk] = features[name]
+    
+    if len(missing) or cached is None or len(cached['path']) != len(paths):
+        save_feature_file(feature_file, columns)
+    
+    return columns
+
+
+def load_feature_file(feature_file: str) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Load the columnar feature cache.
+    
+    Args:
+        feature_file: Path to the .npz cache
+    
+    Returns:
+        dict: Feature columns, or None if missing, unreadable or built
+              for a different analysis size
+    """
+    if not os.path.exists(feature_file):
+        return None
+    
+    try:
+        with np.load(feature_file) as data:
+            if tuple(data['target_size']) != tuple(ImageAnalyzer.TARGET_SIZE):
+                return None
+            return {name: data[name] for name in data.files if name != 'target_size'}
+    except (OSError, KeyError, ValueError) as e:
+        print(f"✗ Ignoring feature cache {feature_file}: {e}")
+        return None
+
+
+def save_feature_file(feature_file: str, columns: Dict[str, np.ndarray]) -> None:
+    """
+    Save the columnar feature cache atomically.
+    
+    Args:
+        feature_file: Path to the .npz cache
+        columns: Columns returned by extract_features()
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(feature_file)), exist_ok=True)
+    temp_path = f"{feature_file}.part"
+    with open(temp_path, 'wb') as f:
+        np.savez(f, target_size=np.array(ImageAnalyzer.TARGET_SIZE), **columns)
+    os.replace(temp_path, feature_file)
+
+
+def load_reference(reference_file: str) -> Dict[str, float]:
+    """
+    Load reference PM2.5 values.
+    
+    Args:
+        reference_file: CSV with 'tile' and 'pm25' columns
+    
+    Returns:
+        dict: Tile stem -> reference PM2.5 (µg/m³)
+    """
+    reference = {}
+    with open(reference_file, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or not {'tile', 'pm25'} <= set(reader.fieldnames):
+            raise ValueError("Reference CSV needs 'tile' and 'pm25' columns")
+        for row in reader:
+            try:
+                reference[os.path.splitext(os.path.basename(row['tile']))[0]] = float(row['pm25'])
+            except (TypeError, ValueError):
+                continue  # Blank or non-numeric measurement
+    
+    return reference
+
+
+class CoefficientFitter:
+    """
+    Fits the estimator's linear weights and piecewise-linear correction
+    by alternating two vectorized least-squares problems:
+    
+    1. Invert the current correction on the reference values and solve
+       for the weights that reproduce those raw values.
+    2. With the raw estimates fixed, solve the correction slopes for
+       every candidate set of breakpoints at once (a batch of small
+       normal-equation systems) and keep the best one.
+    """
+    
+    # Quantiles of the raw estimates tried as correction breakpoints
+    BREAKPOINT_QUANTILES = np.linspace(0.05, 0.95, 19)
+    
+    def __init__(self, breakpoints: Sequence[float] = PM25Estimator.CORRECTION_BREAKPOINTS,
+                 slopes: Sequence[float] = PM25Estimator.CORRECTION_SLOPES,
+                 iterations: int = 5):
+        """
+        Initialize the fitter.
+        
+        Args:
+            breakpoints: Starting correction breakpoints (their count is kept)
+            slopes: Starting correction slopes
+            iterations: Alternating refinement rounds
+        """
+        self.breakpoints = np.asarray(breakpoints, dtype=np.float64)
+        self.slopes = np.asarray(slopes, dtype=np.float64)
+        self.iterations = iterations
+    
+    @staticmethod
+    def design_matrix(columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Build the (N, 7) design matrix the estimator's weighted sum uses.
+        
+        Args:
+            columns: Feature name -> (N,) array
+        
+        Returns:
+            np.ndarray: Columns in WEIGHT_COLUMNS order
+        """
+        count = len(columns[FEATURE_NAMES[0]])
+        matrix = np.empty((count, len(WEIGHT_COLUMNS)), dtype=np.float64)
+        for index, (_, feature) in enumerate(WEIGHT_COLUMNS):
+            if feature is None:
+                matrix[:, index] = 1
+            elif feature in ('brightness', 'saturation'):
+                matrix[:, index] = columns[feature] / 255 * 100  # As normalized by the estimator
+            else:
+                matrix[:, index] = columns[feature]
+        
+        return matrix
+    
+    @staticmethod
+    def _segment_starts(breakpoints: np.ndarray, slopes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(raw, corrected) value at the start of every correction segment."""
+        starts = np.concatenate(([0.0], breakpoints))
+        offsets = np.concatenate(([0.0], np.cumsum(np.diff(starts) * slopes[:-1])))
+        return starts, offsets
+    
+    def _invert_correction(self, pm25: np.ndarray) -> np.ndarray:
+        """Raw estimates that the current correction maps to pm25."""
+        starts, offsets = self._segment_starts(self.breakpoints, self.slopes)
+        segment = np.searchsorted(offsets[1:], pm25, side='right')
+        return starts[segment] + (pm25 - offsets[segment]) / self.slopes[segment]
+    
+    def _fit_correction(self, raw: np.ndarray, pm25: np.ndarray) -> float:
+        """
+        Choose breakpoints and slopes for fixed raw estimates.
+        
+        Args:
+            raw: (N,) raw weighted-sum estimates
+            pm25: (N,) reference values
+        
+        Returns:
+            float: Sum of squared errors of the chosen correction
+        """
+        knots = np.unique(np.quantile(raw, self.BREAKPOINT_QUANTILES))
+        candidates = np.array(
+            list(itertools.combinations(knots, len(self.breakpoints))) + [tuple(self.breakpoints)]
+        )
+        
+        # Hinge basis: pm25 = s0 * raw + sum_k (s_k - s_{k-1}) * max(raw - b_k, 0)
+        basis = np.empty((len(candidates), len(raw), len(self.slopes)))
+        basis[:, :, 0] = raw
+        basis[:, :, 1:] = np.maximum(raw[None, :, None] - candidates[:, None, :], 0)
+        
+        gram = np.einsum('cni,cnj->cij', basis, basis)
+        gram += np.eye(len(self.slopes)) * 1e-9 * np.trace(gram, axis1=1, axis2=2)[:, None, None]
+        solution = np.linalg.solve(gram, np.einsum('cni,n->ci', basis, pm25)[:, :, None])[:, :, 0]
+        
+        errors = np.einsum('cni,ci->cn', basis, solution) - pm25
+        sse = np.einsum('cn,cn->c', errors, errors)
+        
+        # The correction must stay increasing so it can be inverted
+        slopes = np.cumsum(solution, axis=1)
+        sse[np.any(slopes <= 0, axis=1)] = np.inf
+        
+        best = int(np.argmin(sse))
+        if np.isfinite(sse[best]):
+            self.breakpoints = candidates[best]
+            self.slopes = slopes[best]
+        
+        return float(sse[best])
+    
+    def fit(self, columns: Dict[str, np.ndarray], pm25: np.ndarray) -> Dict[str, object]:
+        """
+        Fit weights, breakpoints and slopes.
+        
+        Args:
+            columns: Feature name -> (N,) array for the training tiles
+            pm25: (N,) reference PM2.5 values
+        
+        Returns:
+            dict: coefficients, breakpoints and slopes for write_coefficient_file()
+        """
+        matrix = self.design_matrix(columns)
+        if len(pm25) < 2 * matrix.shape[1]:
+            raise ValueError(f"Need at least {2 * matrix.shape[1]} reference tiles, got {len(pm25)}")
+        
+        for _ in range(self.iterations):
+            weights = np.linalg.lstsq(matrix, self._invert_correction(pm25), rcond=None)[0]
+            self._fit_correction(matrix @ weights, pm25)
+        
+        # Final weights for the chosen correction
+        weights = np.linalg.lstsq(matrix, self._invert_correction(pm25), rcond=None)[0]
+        
+        return {
+            'coefficients': {name: float(w) for (name, _), w in zip(WEIGHT_COLUMNS, weights)},
+            'breakpoints': tuple(float(b) for b in self.breakpoints),
+            'slopes': tuple(float(s) for s in self.slopes)
+        }
+
+
+def evaluate(estimator: PM25Estimator, columns: Dict[str, np.ndarray],
+             pm25: np.ndarray, splits: np.ndarray) -> Dict[str, Dict[str, float]]:
+    """
+    Error of an estimator on every split.
+    
+    Args:
+        estimator: Estimator to evaluate
+        columns: Feature name -> (N,) array
+        pm25: (N,) reference values
+        splits: (N,) split name of each tile
+    
+    Returns:
+        dict: Split -> {'tiles', 'mae', 'rmse'}
+    """
+    errors = estimator.estimate_array(columns) - pm25
+    
+    metrics = {}
+    for split in SPLITS:
+        mask = splits == split
+        if mask.any():
+            metrics[split] = {
+                'tiles': int(mask.sum()),
+                'mae': round(float(np.mean(np.abs(errors[mask]))), 3),
+                'rmse': round(float(np.sqrt(np.mean(errors[mask] ** 2))), 3)
+            }
+    
+    return metrics
+
+
+def calibrate(reference_file: str, dataset_dir: str = DATASET_DIR,
+              feature_file: str = FEATURE_FILE,
+              output_file: str = PM25Estimator.COEFFICIENTS_FILE,
+              workers: Optional[int] = None,
+              iterations: int = 5) -> Dict[str, object]:
+    """
+    Run the full calibration and write a new coefficient file.
+    
+    Args:
+        reference_file: CSV with 'tile' and 'pm25' columns
+        dataset_dir: Directory holding the split folders
+        feature_file: Columnar .npz cache of extracted features
+        output_file: Coefficient file to write
+        workers: Feature extraction processes (defaults to the CPU count)
+        iterations: Alternating refinement rounds
+    
+    Returns:
+        dict: Version, fitted values and per-split metrics
+    """
+    columns = extract_features(dataset_dir, feature_file, workers)
+    reference = load_reference(reference_file)
+    
+    stems = np.array([os.path.splitext(os.path.basename(path))[0] for path in columns['path']])
+    known = np.array([stem in reference for stem in stems])
+    if not known.any():
+        raise ValueError("No reference values match any tile")
+    
+    pm25 = np.array([reference[stem] for stem in stems[known]])
+    splits = columns['split'][known]
+    features = {name: columns[name][known] for name in FEATURE_NAMES}
+    train = splits == 'train'
+    
+    baseline = PM25Estimator(None)
+    fitted = CoefficientFitter(baseline.CORRECTION_BREAKPOINTS, baseline.CORRECTION_SLOPES,
+                               iterations).fit({name: values[train] for name, values in features.items()},
+                                               pm25[train])
+    
+    candidate = PM25Estimator(None)
+    candidate.COEFFICIENTS = fitted['coefficients']
+    candidate.CORRECTION_BREAKPOINTS = fitted['breakpoints']
+    candidate.CORRECTION_SLOPES = fitted['slopes']
+    
+    metrics = evaluate(candidate, features, pm25, splits)
+    version = datetime.now().strftime('%Y%m%d-%H%M%S')
+    
+    write_coefficient_file(output_file, fitted['coefficients'], fitted['breakpoints'],
+                           fitted['slopes'], version, {
+                               'created': datetime.now().isoformat(),
+                               'reference_file': reference_file,
+                               'metrics': metrics,
+                               'builtin_metrics': evaluate(baseline, features, pm25, splits)
+                           })
+    
+    return {'version': version, 'metrics': metrics, **fitted}
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description='Calibrate PM2.5 estimator coefficients')
+    parser.add_argument('--reference', required=True,
+                        help="CSV of reference PM2.5 per tile ('tile' and 'pm25' columns)")
+    parser.add_argument('--dataset', default=DATASET_DIR, help='Directory with train/val/test splits')
+    parser.add_argument('--features', default=FEATURE_FILE, help='Columnar feature cache (.npz)')
+    parser.add_argument('--output', default=PM25Estimator.COEFFICIENTS_FILE,
+                        help='Coefficient file to write')
+    parser.add_argument('--workers', type=int, default=None, help='Feature extraction processes')
+    parser.add_argument('--iterations', type=int, default=5, help='Alternating refinement rounds')
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    result = calibrate(args.reference, args.dataset, args.features, args.output,
+                       args.workers, args.iterations)
+    
+    print(f"✓ Coefficient set {result['version']} written to {args.output}")
+    for name, value in result['coefficients'].items():
+        print(f"  {name}: {value:.4f}")
+    print(f"  breakpoints: {', '.join(f'{b:.2f}' for b in result['breakpoints'])}")
+    print(f"  slopes: {', '.join(f'{s:.4f}' for s in result['slopes'])}")
+    for split, split_metrics in result['metrics'].items():
+        print(f"  {split}: MAE {split_metrics['mae']} RMSE {split_metrics['rmse']} "
+              f"({split_metrics['tiles']} tiles)")
+    print(f"✓ Calibration finished in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
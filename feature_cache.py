@@ -0,0 +1,226 @@
+"""
+Feature Cache Module
+Caches extracted features and PM2.5 estimates by a hash of the uploaded
+image bytes, so resubmitted tiles skip decoding and analysis.
+
+Author: PM2.5 Estimation System
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def _to_builtin(value):
+    """JSON fallback for numpy scalars and arrays in analysis results."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FeatureCache:
+    """
+    Two-tier cache of analysis results keyed by the SHA-256 of the image
+    bytes: a bounded in-process LRU in front of a directory of JSON files
+    that every gunicorn worker on the machine shares.
+    """
+    
+    # Entries kept in memory per worker (each is a few hundred bytes)
+    DEFAULT_CAPACITY = 1024
+    
+    # Seconds an on-disk entry is kept after it was last written or read
+    DEFAULT_TTL = 7 * 24 * 3600
+    
+    # Minimum seconds between scans of the cache directory for expired entries
+    PRUNE_INTERVAL = 600
+    
+    def __init__(self, cache_dir: Optional[str] = 'data/feature_cache',
+                 capacity: int = DEFAULT_CAPACITY, ttl: Optional[float] = DEFAULT_TTL):
+        """
+        Initialize the cache.
+        
+        Args:
+            cache_dir: Directory for the on-disk tier, or None for a
+                       memory-only cache
+            capacity: Maximum number of entries kept in memory
+            ttl: Seconds unused on-disk entries are kept, or None to
+                 keep them forever
+        """
+        if capacity < 1:
+            raise ValueError("Cache capacity must be at least 1")
+        
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.ttl = ttl
+        self._last_prune = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def key(data: bytes) -> str:
+        """
+        Cache key for an uploaded image.
+        
+        Args:
+            data: Raw bytes of the image file
+        
+        Returns:
+            str: Hex SHA-256 digest of the bytes
+        """
+        return hashlib.sha256(data).hexdigest()
+    
+    @staticmethod
+    def is_key(value: str) -> bool:
+        """
+        Check that a client-supplied string is a well-formed cache key.
+        
+        Args:
+            value: Candidate key (e.g. an analysis_id from a URL)
+        
+        Returns:
+            bool: True for a 64-character lowercase hex digest
+        """
+        return len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+    
+    def _path(self, key: str) -> str:
+        """On-disk location of an entry, fanned out by key prefix."""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+    
+    def _remember(self, key: str, entry: Dict) -> None:
+        """Insert an entry in the memory tier, evicting the least recently used."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached entry.
+        
+        Args:
+            key: Cache key from FeatureCache.key()
+        
+        Returns:
+            dict: Cached entry, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return entry
+        
+        if self.cache_dir:
+            try:
+                with open(self._path(key), 'r') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None  # Not cached yet, or a damaged file
+            
+            if entry is not None:
+                self._remember(key, entry)
+                with self._lock:
+                    self._counters['disk_hits'] += 1
+                try:
+                    os.utime(self._path(key))  # Still in use: postpone expiry
+                except OSError:
+                    pass
+                return entry
+        
+        with self._lock:
+            self._counters['misses'] += 1
+        
+        return None
+    
+    def put(self, key: str, entry: Dict) -> None:
+        """
+        Store an entry in memory and on disk.
+        
+        The file is written to a temporary name and renamed into place,
+        so concurrent workers never read a partially written entry.
+        
+        Args:
+            key: Cache key from FeatureCache.key()
+            entry: JSON-serializable analysis result
+        """
+        self._remember(key, entry)
+        
+        if not self.cache_dir:
+            return
+        
+        self._prune()
+        
+        path = self._path(key)
+        temp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f, default=_to_builtin)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"✗ Failed to persist cache entry {key[:12]}: {e}")
+            # Never leave a partial file in the shared directory
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass  # Already renamed or never fully created
+    
+    def _prune(self) -> None:
+        """
+        Delete on-disk entries not written or read for the TTL.
+        
+        Scans the shared directory (entries of every worker process, and
+        temporary files orphaned by a crash) at most once per PRUNE_INTERVAL.
+        """
+        if self.ttl is None:
+            return
+        
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < self.PRUNE_INTERVAL:
+                return
+            self._last_prune = now
+        
+        cutoff = now - self.ttl
+        removed = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(('.json', '.part')):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass  # Removed meanwhile by another worker
+        
+        if removed:
+            print(f"✓ Pruned {removed} expired feature cache entries")
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Hit and miss counters for this worker.
+        
+        Returns:
+            dict: memory_hits, disk_hits, hits, misses and entries in memory
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        
+        stats['hits'] = stats['memory_hits'] + stats['disk_hits']
+        
+        return stats
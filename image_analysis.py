@@ -8,7 +8,31 @@ Author: PM2.5 Estimation System
 
 import cv2
 import numpy as np
-from typing import Dict, Tuple
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+from image_context import ImageContext, read_image
+
+
+# Names of the features returned by ImageAnalyzer.analyze(), in display order
+FEATURE_NAMES = (
+    'haze_score',
+    'brightness',
+    'contrast',
+    'saturation',
+    'turbidity',
+    'visibility'
+)
+
+# Exact 8-bit HSV saturation for every (max channel, max - min) pair, using
+# the same 12-bit fixed-point division table as cv2.COLOR_BGR2HSV
+_SATURATION_DIV = np.zeros(256, dtype=np.int64)
+_SATURATION_DIV[1:] = np.round((255 << 12) / np.arange(1, 256))
+_SATURATION_TABLE = ((np.arange(256)[None, :] * _SATURATION_DIV[:, None] +
+                      (1 << 11)) >> 12).astype(np.float64)
+
+# Dark channel value (max - spread) for the same (max, spread) pairs
+_DARK_CHANNEL_TABLE = (np.arange(256)[:, None] -
+                       np.arange(256)[None, :]).astype(np.float64)
 
 
 class ImageAnalyzer:
@@ -17,40 +41,110 @@ class ImageAnalyzer:
     that correlate with PM2.5 pollution levels.
     """
     
-    def __init__(self, image_path: str):
+    # Standard (width, height) every image is resized to before analysis
+    TARGET_SIZE = ImageContext.TARGET_SIZE
+    
+    # Normalization constants shared by the single-image and batch paths
+    MAX_EDGE_VARIANCE = 1000  # Typical max Laplacian variance for clear images
+    MAX_CONTRAST_STD = 80     # Typical max gray-level standard deviation
+    MAX_ENTROPY = 8           # Max entropy of an 8-bit histogram
+    
+    # Empirical exponents (fitted on the Delhi z15 tiles) that map a statistic
+    # measured at native resolution to its value at TARGET_SIZE:
+    #   value_at_target = value_native * (target_area / native_area) ** exponent
+    RESOLUTION_EXPONENTS = {
+        'edge_variance': -1.85,  # Upscaling spreads edges, Laplacian variance drops steeply
+        'contrast_std': -0.03,   # Interpolation slightly narrows the histogram
+        'entropy': -0.0075
+    }
+    
+    # Demand-driven feature registry: feature name -> (intermediate inputs,
+    # method computing the feature from them). analyze(features=...) builds
+    # only the intermediates the requested features need, so a feature
+    # added here costs nothing unless it is asked for.
+    FEATURES = {
+        'haze_score': (('laplacian',), '_haze_from_laplacian'),
+        'brightness': (('histogram',), '_brightness_from_histogram'),
+        'contrast': (('histogram',), '_contrast_from_histogram'),
+        'saturation': (('channel_histogram',), '_saturation_from_channels'),
+        'turbidity': (('channel_histogram',), '_turbidity_from_channels'),
+        'visibility': (('histogram',), '_visibility_from_histogram')
+    }
+    
+    # Intermediate name -> (inputs, method building it); each is built at
+    # most once per analyzed image
+    INTERMEDIATES = {
+        'gray': ((), '_build_gray'),
+        'histogram': (('gray',), '_build_histogram'),
+        'laplacian': (('gray',), '_build_laplacian'),
+        'channel_histogram': ((), '_build_channel_histogram')
+    }
+    
+    def __init__(self, image_path: Optional[str] = None,
+                 image: Optional[np.ndarray] = None,
+                 context: Optional[ImageContext] = None,
+                 native_resolution: bool = False):
         """
-        Initialize the analyzer with an image path.
+        Initialize the analyzer with an image path, a decoded image or
+        a shared image context.
         
         Args:
             image_path: Path to the satellite image
+            image: Already decoded BGR image (skips reading from disk)
+            context: Shared ImageContext whose derived views are reused
+            native_resolution: Analyze images smaller than TARGET_SIZE at
+                               their own size and normalize the features to
+                               TARGET_SIZE instead of upscaling the pixels
         """
+        if image_path is None and image is None and context is None:
+            raise ValueError("One of image_path, image or context must be given")
+        
         self.image_path = image_path
+        self.source_image = image
+        self.context = context
+        self.native_resolution = native_resolution
+        self.resolution_scale = 1.0
         self.image = None
         self.gray_image = None
         self.hsv_image = None
+        self._intermediates = {}
         
-    def load_and_preprocess(self) -> bool:
+    def load_and_preprocess(self, build_hsv: bool = True,
+                            build_gray: bool = True) -> bool:
         """
         Load image and prepare it for analysis.
         
+        Args:
+            build_hsv: Also build the full HSV image (not needed by the
+                       fused feature kernel)
+            build_gray: Also build the grayscale image (the feature
+                        registry builds it only when a feature needs it)
+        
         Returns:
             bool: True if successful, False otherwise
         """
         try:
-            # Read image
-            self.image = cv2.imread(self.image_path)
+            # Read and resize the image, unless a context already holds it
+            upscale = not self.native_resolution
+            if self.context is None:
+                if self.source_image is not None:
+                    self.context = ImageContext(self.source_image, self.TARGET_SIZE, upscale)
+                else:
+                    self.context = ImageContext.from_path(self.image_path, self.TARGET_SIZE, upscale)
             
-            if self.image is None:
-                raise ValueError("Failed to load image")
+            self.image = self.context.bgr
+            self._intermediates = {}
             
-            # Resize to standard size for consistent processing
-            self.image = cv2.resize(self.image, (800, 600))
+            # Ratio of the reference pixel count to the analyzed one
+            if self.native_resolution:
+                self.resolution_scale = self._resolution_scale(self.image.shape[:2])
             
-            # Convert to grayscale
-            self.gray_image = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+            # Grayscale and HSV views are shared through the context
+            if build_gray:
+                self.gray_image = self.context.gray
             
-            # Convert to HSV for saturation analysis
-            self.hsv_image = cv2.cvtColor(self.image, cv2.COLOR_BGR2HSV)
+            if build_hsv:
+                self.hsv_image = self.context.hsv
             
             return True
             
@@ -68,12 +162,13 @@ class ImageAnalyzer:
         """
         # Apply Laplacian edge detection
         laplacian = cv2.Laplacian(self.gray_image, cv2.CV_64F)
-        edge_variance = laplacian.var()
+        edge_variance = laplacian.var() * self._resolution_factor(
+            'edge_variance', self.resolution_scale
+        )
         
         # Lower variance = more haze
         # Normalize to 0-100 scale (inverted)
-        max_variance = 1000  # Typical max for clear images
-        haze_score = max(0, 100 - (edge_variance / max_variance * 100))
+        haze_score = max(0, 100 - (edge_variance / self.MAX_EDGE_VARIANCE * 100))
         
         return min(100, haze_score)
     
@@ -98,11 +193,12 @@ class ImageAnalyzer:
             float: Contrast score (0-100)
         """
         # Standard deviation represents contrast
-        contrast_std = np.std(self.gray_image)
+        contrast_std = np.std(self.gray_image) * self._resolution_factor(
+            'contrast_std', self.resolution_scale
+        )
         
         # Normalize to 0-100 scale
-        # Typical std range: 0-80
-        contrast_score = (contrast_std / 80) * 100
+        contrast_score = (contrast_std / self.MAX_CONTRAST_STD) * 100
         
         return min(100, contrast_score)
     
@@ -156,22 +252,44 @@ class ImageAnalyzer:
         
         # Calculate entropy (higher entropy = better visibility)
         entropy = -np.sum(hist_norm * np.log2(hist_norm + 1e-10))
+        entropy *= self._resolution_factor('entropy', self.resolution_scale)
         
         # Normalize to 0-100 (max entropy ≈ 8 for 8-bit image)
-        visibility_score = (entropy / 8) * 100
+        visibility_score = (entropy / self.MAX_ENTROPY) * 100
         
         return min(100, visibility_score)
     
-    def analyze(self) -> Dict[str, float]:
+    def analyze(self, fused: bool = False,
+                features: Optional[Sequence[str]] = None) -> Dict[str, float]:
         """
         Perform complete image analysis and extract all features.
         
+        Args:
+            fused: Use the single-pass fused kernel instead of the
+                   individual calculate_* methods (same results, faster)
+            features: Names from FEATURES to compute, e.g. only the ones
+                      confidence scoring needs; only their intermediates
+                      are built. None computes all six.
+        
         Returns:
             dict: Dictionary containing all atmospheric indicators
         """
-        if not self.load_and_preprocess():
+        if features is not None:
+            unknown = [name for name in features if name not in self.FEATURES]
+            if unknown:
+                raise ValueError(f"Unknown features: {', '.join(unknown)}")
+        
+        demand_driven = fused or features is not None
+        if not self.load_and_preprocess(build_hsv=not demand_driven,
+                                        build_gray=not demand_driven):
             raise ValueError("Failed to load and preprocess image")
         
+        if features is not None:
+            return self._compute_features(features)
+        
+        if fused:
+            return self._fused_features()
+        
         features = {
             'haze_score': self.calculate_haze_score(),
             'brightness': self.calculate_brightness(),
@@ -183,6 +301,320 @@ class ImageAnalyzer:
         
         return features
     
+    def _fused_features(self) -> Dict[str, float]:
+        """
+        Extract all features with as few passes over the pixels as possible.
+        
+        One gray histogram gives brightness, contrast and visibility; one
+        joint (max channel, max - min) histogram gives saturation and the
+        dark channel without building the HSV image or splitting channels;
+        the Laplacian is kept in 16-bit instead of float64.
+        
+        Returns:
+            dict: Dictionary containing all atmospheric indicators
+        """
+        return self._compute_features(FEATURE_NAMES)
+        
+    def _compute_features(self, names: Sequence[str]) -> Dict[str, float]:
+        """
+        Compute the named features through the registry.
+        
+        Args:
+            names: Keys of FEATURES
+        
+        Returns:
+            dict: Feature name -> value, in the requested order
+        """
+        features = {}
+        for name in names:
+            inputs, method = self.FEATURES[name]
+            features[name] = getattr(self, method)(*[self._intermediate(i) for i in inputs])
+        
+        return features
+    
+    def _intermediate(self, name: str):
+        """
+        Get an intermediate, building it (and its own inputs) on first use.
+        
+        Args:
+            name: Key of INTERMEDIATES
+        
+        Returns:
+            The intermediate array
+        """
+        if name not in self._intermediates:
+            inputs, method = self.INTERMEDIATES[name]
+            self._intermediates[name] = getattr(self, method)(
+                *[self._intermediate(i) for i in inputs]
+            )
+        
+        return self._intermediates[name]
+    
+    def _build_gray(self) -> np.ndarray:
+        """Grayscale image, shared through the context."""
+        self.gray_image = self.context.gray
+        return self.gray_image
+    
+    def _build_histogram(self, gray: np.ndarray) -> np.ndarray:
+        """256-bin gray-level histogram."""
+        return cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    
+    def _build_laplacian(self, gray: np.ndarray) -> np.ndarray:
+        """16-bit Laplacian (exact for 8-bit input, a quarter of float64's memory)."""
+        return cv2.Laplacian(gray, cv2.CV_16S)
+    
+    def _build_channel_histogram(self) -> np.ndarray:
+        """
+        Joint histogram of (max channel, max - min channel) per pixel.
+        
+        Both HSV saturation and the dark channel are functions of this
+        pair, so one histogram serves both features. Computed on
+        zero-copy channel views.
+        """
+        b, g, r = self.image[:, :, 0], self.image[:, :, 1], self.image[:, :, 2]
+        channel_max = np.maximum(b, g)
+        np.maximum(channel_max, r, out=channel_max)
+        channel_min = np.minimum(b, g)
+        np.minimum(channel_min, r, out=channel_min)
+        spread = cv2.subtract(channel_max, channel_min)
+        return cv2.calcHist(
+            [channel_max, spread], [0, 1], None, [256, 256], [0, 256, 0, 256]
+        )
+        
+    def _haze_from_laplacian(self, laplacian: np.ndarray) -> float:
+        """Haze score (0-100) from the Laplacian variance."""
+        _, edge_std = cv2.meanStdDev(laplacian)
+        edge_variance = float(edge_std[0, 0]) ** 2 * self._resolution_factor(
+            'edge_variance', self.resolution_scale
+        )
+        return min(100, max(0, 100 - (edge_variance / self.MAX_EDGE_VARIANCE * 100)))
+    
+    def _brightness_from_histogram(self, hist: np.ndarray) -> float:
+        """Mean gray level (0-255) from the histogram's first moment."""
+        return float(hist @ np.arange(256, dtype=np.float64)) / float(hist.sum())
+    
+    def _contrast_from_histogram(self, hist: np.ndarray) -> float:
+        """Contrast score (0-100) from the histogram's standard deviation."""
+        levels = np.arange(256, dtype=np.float64)
+        pixels = float(hist.sum())
+        mean = float(hist @ levels) / pixels
+        variance = max(0.0, float(hist @ (levels ** 2)) / pixels - mean ** 2)
+        contrast_std = np.sqrt(variance) * self._resolution_factor(
+            'contrast_std', self.resolution_scale
+        )
+        return min(100, contrast_std / self.MAX_CONTRAST_STD * 100)
+    
+    def _visibility_from_histogram(self, hist: np.ndarray) -> float:
+        """Visibility score (0-100) from the histogram entropy."""
+        hist_norm = hist / hist.sum()
+        entropy = -np.sum(hist_norm * np.log2(hist_norm + 1e-10))
+        entropy *= self._resolution_factor('entropy', self.resolution_scale)
+        return min(100, (entropy / self.MAX_ENTROPY) * 100)
+    
+    def _saturation_from_channels(self, joint: np.ndarray) -> float:
+        """Mean HSV saturation (0-255) from the (max, spread) histogram."""
+        pixels = self.image.shape[0] * self.image.shape[1]
+        return float(np.sum(joint * _SATURATION_TABLE)) / pixels
+    
+    def _turbidity_from_channels(self, joint: np.ndarray) -> float:
+        """Dark-channel turbidity score (0-100) from the (max, spread) histogram."""
+        pixels = self.image.shape[0] * self.image.shape[1]
+        return float(np.sum(joint * _DARK_CHANNEL_TABLE)) / pixels / 255 * 100
+    
+    @classmethod
+    def analyze_batch(cls, images: Union[Sequence[str], np.ndarray],
+                      target_size: Optional[Tuple[int, int]] = TARGET_SIZE,
+                      chunk_size: int = 32,
+                      native_resolution: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Extract all features for a stack of images in one batched pass.
+        
+        Per image only the fused path's histograms and Laplacian are
+        computed; features for the whole chunk then come from array
+        operations over the stacked histograms, without building
+        analyzer objects or HSV images.
+        
+        Args:
+            images: List of image paths or an (N, H, W, 3) uint8 BGR array
+            target_size: (width, height) each image is resized to, as in
+                         analyze(); None keeps the images at their own size
+            chunk_size: Number of images processed together (bounds memory)
+            native_resolution: Keep images smaller than target_size at their
+                               own size and normalize features to target_size
+            
+        Returns:
+            dict: Feature name -> float64 array of shape (N,)
+        """
+        stack = cls._load_batch(images, target_size, upscale=not native_resolution)
+        count = stack.shape[0]
+        
+        scale = 1.0
+        if native_resolution and target_size is not None:
+            scale = cls._resolution_scale(stack.shape[1:3], target_size)
+        
+        features = {name: np.empty(count, dtype=np.float64) for name in FEATURE_NAMES}
+        
+        chunk_size = max(1, chunk_size)
+        for start in range(0, count, chunk_size):
+            chunk_features = cls._batch_features(stack[start:start + chunk_size], scale)
+            for name, values in chunk_features.items():
+                features[name][start:start + len(values)] = values
+        
+        return features
+    
+    @classmethod
+    def _load_batch(cls, images: Union[Sequence[str], np.ndarray],
+                    target_size: Optional[Tuple[int, int]],
+                    upscale: bool = True) -> np.ndarray:
+        """
+        Build an (N, H, W, 3) uint8 stack from paths or an existing array.
+        
+        Args:
+            images: List of image paths or an (N, H, W, 3) uint8 BGR array
+            target_size: (width, height) to resize to, or None
+            upscale: Whether images smaller than target_size are enlarged
+            
+        Returns:
+            np.ndarray: Image stack ready for batched analysis
+        """
+        if isinstance(images, np.ndarray):
+            if images.ndim != 4 or images.shape[-1] != 3 or images.dtype != np.uint8:
+                raise ValueError("Expected an (N, H, W, 3) uint8 image array")
+            
+            if target_size is None or images.shape[2:0:-1] == tuple(target_size):
+                return images
+            
+            if not upscale and images.shape[1] * images.shape[2] <= target_size[0] * target_size[1]:
+                return images
+        
+        stack = None
+        
+        # Decoding and resizing are inherently per image; everything after
+        # this works on the whole stack
+        for index, image in enumerate(images):
+            if isinstance(image, str):
+                image = read_image(image, target_size)
+            
+            if target_size is not None:
+                image = ImageContext(image, target_size, upscale).bgr
+            
+            if stack is None:
+                stack = np.empty((len(images),) + image.shape, dtype=np.uint8)
+            elif image.shape != stack.shape[1:]:
+                raise ValueError(f"Image {index} differs in size from the rest of the batch")
+            
+            stack[index] = image
+        
+        if stack is None:
+            width, height = target_size or cls.TARGET_SIZE
+            stack = np.empty((0, height, width, 3), dtype=np.uint8)
+        
+        return stack
+    
+    @classmethod
+    def _batch_features(cls, stack: np.ndarray,
+                        resolution_scale: float = 1.0) -> Dict[str, np.ndarray]:
+        """
+        Compute all six features for an (N, H, W, 3) chunk of images.
+        
+        Each image is reduced to the same statistics as the fused path:
+        a gray histogram, a joint (max channel, max - min) histogram and
+        the 16-bit Laplacian's standard deviation. The histograms of the
+        whole chunk are stacked by image index and turned into features
+        with array operations. Working image by image keeps every
+        intermediate in cache, which is faster than whole-stack passes.
+        
+        Args:
+            stack: uint8 BGR image stack
+            resolution_scale: Reference pixel count / actual pixel count,
+                              used to normalize native-resolution features
+            
+        Returns:
+            dict: Feature name -> float64 array of shape (N,)
+        """
+        count, height, width, _ = stack.shape
+        pixels = height * width
+        
+        hist = np.empty((count, 256), dtype=np.float32)
+        joint = np.empty((count, 256, 256), dtype=np.float32)
+        edge_std = np.empty(count, dtype=np.float64)
+        
+        for index in range(count):
+            image = stack[index]
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            hist[index] = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+            edge_std[index] = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))[1][0, 0]
+            
+            b, g, r = cv2.split(image)
+            channel_max = cv2.max(cv2.max(b, g), r)
+            spread = cv2.subtract(channel_max, cv2.min(cv2.min(b, g), r))
+            joint[index] = cv2.calcHist(
+                [channel_max, spread], [0, 1], None, [256, 256], [0, 256, 0, 256]
+            )
+        
+        # Brightness and contrast from histogram moments
+        levels = np.arange(256, dtype=np.float64)
+        mean = hist @ levels / pixels
+        variance = np.maximum(hist @ (levels ** 2) / pixels - mean ** 2, 0)
+        contrast_std = np.sqrt(variance) * cls._resolution_factor('contrast_std', resolution_scale)
+        contrast = np.minimum(100, contrast_std / cls.MAX_CONTRAST_STD * 100)
+        
+        # Visibility from histogram entropy
+        hist_norm = hist / hist.sum(axis=1, keepdims=True)
+        entropy = -np.sum(hist_norm * np.log2(hist_norm + 1e-10), axis=1)
+        entropy *= cls._resolution_factor('entropy', resolution_scale)
+        visibility = np.minimum(100, entropy / cls.MAX_ENTROPY * 100)
+        
+        # Haze from the Laplacian variance
+        edge_variance = edge_std ** 2 * cls._resolution_factor('edge_variance', resolution_scale)
+        haze = np.clip(100 - edge_variance / cls.MAX_EDGE_VARIANCE * 100, 0, 100)
+        
+        # Saturation and dark channel from the (max, spread) histograms
+        saturation = np.tensordot(joint, _SATURATION_TABLE, axes=([1, 2], [0, 1])) / pixels
+        dark_channel = np.tensordot(joint, _DARK_CHANNEL_TABLE, axes=([1, 2], [0, 1])) / pixels
+        
+        return {
+            'haze_score': haze,
+            'brightness': mean,
+            'contrast': contrast,
+            'saturation': saturation,
+            'turbidity': dark_channel / 255 * 100,
+            'visibility': visibility
+        }
+    
+    @classmethod
+    def _resolution_scale(cls, shape: Tuple[int, int],
+                          reference_size: Optional[Tuple[int, int]] = None) -> float:
+        """
+        Ratio of the reference pixel count to that of an analyzed image.
+        
+        Args:
+            shape: (height, width) of the analyzed image
+            reference_size: (width, height) features are normalized to
+                            (defaults to TARGET_SIZE)
+            
+        Returns:
+            float: Pixel-count ratio (1.0 at the reference size)
+        """
+        width, height = reference_size or cls.TARGET_SIZE
+        return (width * height) / (shape[0] * shape[1])
+    
+    @classmethod
+    def _resolution_factor(cls, statistic: str, scale: float) -> float:
+        """
+        Multiplier that maps a native-resolution statistic to TARGET_SIZE.
+        
+        Args:
+            statistic: Key of RESOLUTION_EXPONENTS
+            scale: Reference pixel count / actual pixel count
+            
+        Returns:
+            float: Normalization factor (exactly 1.0 when scale is 1.0)
+        """
+        if scale == 1.0:
+            return 1.0
+        return scale ** cls.RESOLUTION_EXPONENTS[statistic]
+    
     def get_processed_image(self) -> np.ndarray:
         """
         Get the preprocessed image for visualization.
@@ -191,6 +623,15 @@ class ImageAnalyzer:
             np.ndarray: Processed image
         """
         return self.image
+    
+    def get_context(self) -> Optional[ImageContext]:
+        """
+        Get the image context so visualizations can reuse its views.
+        
+        Returns:
+            ImageContext: Context of the analyzed image (None before loading)
+        """
+        return self.context
 
 
 def analyze_image(image_path: str) -> Dict[str, float]:
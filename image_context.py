@@ -0,0 +1,227 @@
+"""
+Image Context Module
+Holds one decoded satellite image and the color representations
+derived from it, so analysis and visualization share the work.
+
+Author: PM2.5 Estimation System
+"""
+
+import cv2
+import io
+import numpy as np
+from functools import cached_property
+from PIL import Image
+from typing import Optional, Tuple, Union
+
+from image_reader import MAX_DIRECT_PIXELS, is_raster_path, open_raster, read_overview
+
+
+# OpenCV flags that let libjpeg decode directly at 1/8, 1/4 or 1/2 scale
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+# EXIF tag holding the image orientation (1-8)
+_EXIF_ORIENTATION = 0x0112
+
+
+def reduced_decode_flag(source: Union[str, bytes],
+                        target_size: Optional[Tuple[int, int]]) -> int:
+    """
+    Choose the strongest reduced JPEG decode that still covers target_size.
+    
+    Only the file header is read (via PIL) to get the source dimensions,
+    so large uploads are decoded straight to roughly the size they will
+    be resized to instead of at full resolution.
+    
+    Args:
+        source: Image path or raw image bytes
+        target_size: (width, height) the image will be resized to, or None
+        
+    Returns:
+        int: cv2.imread / cv2.imdecode flag
+    """
+    if target_size is None:
+        return cv2.IMREAD_COLOR
+    
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as header:
+            # Only JPEG decoding is actually cheaper at reduced scale
+            if header.format != 'JPEG':
+                return cv2.IMREAD_COLOR
+            width, height = header.size
+            # OpenCV applies the EXIF orientation; 5-8 swap the two axes
+            if header.getexif().get(_EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+                width, height = height, width
+    except Exception:
+        return cv2.IMREAD_COLOR
+    
+    target_width, target_height = target_size
+    for factor, flag in _REDUCED_DECODE_FLAGS:
+        if width // factor >= target_width and height // factor >= target_height:
+            return flag
+    
+    return cv2.IMREAD_COLOR
+
+
+def read_image(image_path: str,
+               target_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Read an image file, decoding large JPEGs at reduced resolution.
+    
+    Args:
+        image_path: Path to the image file
+        target_size: (width, height) the image will be resized to, or None
+                     to always decode at full resolution
+    
+    Returns:
+        np.ndarray: Decoded BGR image
+    """
+    image = cv2.imread(image_path, reduced_decode_flag(image_path, target_size))
+    
+    if image is None:
+        raise ValueError(f"Failed to load image: {image_path}")
+    
+    return image
+
+
+def decode_image(data: bytes,
+                 target_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Decode an encoded image (JPEG, PNG, TIFF, ...) from an in-memory buffer.
+    
+    Args:
+        data: Raw bytes of the image file
+        target_size: (width, height) the image will be resized to, or None
+                     to always decode at full resolution
+    
+    Returns:
+        np.ndarray: Decoded BGR image
+    """
+    if not data:
+        raise ValueError("Empty image data")
+    
+    flag = reduced_decode_flag(data, target_size)
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    
+    if image is None:
+        raise ValueError("Failed to decode image")
+    
+    return image
+
+
+class ImageContext:
+    """
+    A decoded image at the standard processing size, with its gray,
+    LAB and HSV views built lazily and at most once each.
+    
+    ImageAnalyzer and every PM25Visualizer image method accept a context,
+    so one request converts each representation a single time.
+    """
+    
+    # Standard (width, height) every image is resized to
+    TARGET_SIZE = (800, 600)
+    
+    def __init__(self, image: np.ndarray,
+                 target_size: Optional[Tuple[int, int]] = TARGET_SIZE,
+                 upscale: bool = True):
+        """
+        Initialize the context from a decoded BGR image.
+        
+        Args:
+            image: Decoded BGR image of any size
+            target_size: (width, height) to resize to, or None to keep
+                         the image at its own size
+            upscale: If False, images with fewer pixels than target_size
+                     keep their native resolution instead of being enlarged
+        """
+        if target_size is not None and image.shape[1::-1] != tuple(target_size):
+            target_area = target_size[0] * target_size[1]
+            if upscale or image.shape[0] * image.shape[1] > target_area:
+                image = cv2.resize(image, tuple(target_size))
+        
+        self.bgr = image
+    
+    @classmethod
+    def from_path(cls, image_path: str,
+                  target_size: Optional[Tuple[int, int]] = TARGET_SIZE,
+                  upscale: bool = True) -> 'ImageContext':
+        """
+        Create a context by reading an image file.
+        
+        Large JPEGs are decoded at reduced resolution close to target_size.
+        Very large memory-mappable rasters (uncompressed TIFF, NPY) are
+        downsampled band by band without loading them into memory. With
+        target_size=None, rasters up to MAX_DIRECT_PIXELS are loaded at
+        full size and larger ones are downsampled, keeping their aspect
+        ratio, to at most MAX_DIRECT_PIXELS.
+        
+        Args:
+            image_path: Path to the satellite image
+            target_size: (width, height) to resize to, or None
+            upscale: Whether images smaller than target_size are enlarged
+        
+        Returns:
+            ImageContext: Context for the loaded image
+        """
+        if is_raster_path(image_path):
+            try:
+                raster = open_raster(image_path)
+            except ValueError:
+                raster = None  # Compressed or unusual layout: decode normally
+            
+            if raster is not None:
+                height, width = raster.shape[:2]
+                if target_size is None:
+                    if width * height <= MAX_DIRECT_PIXELS:
+                        return cls(np.ascontiguousarray(raster), None)
+                    # Never materialise a huge raster: cap the pixel count
+                    scale = (MAX_DIRECT_PIXELS / (width * height)) ** 0.5
+                    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+                    return cls(read_overview(raster, size), None)
+                if width * height > MAX_DIRECT_PIXELS:
+                    return cls(read_overview(raster, target_size), target_size, upscale)
+                return cls(np.ascontiguousarray(raster), target_size, upscale)
+        
+        return cls(read_image(image_path, target_size), target_size, upscale)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes,
+                   target_size: Optional[Tuple[int, int]] = TARGET_SIZE,
+                   upscale: bool = True) -> 'ImageContext':
+        """
+        Create a context by decoding an in-memory image file.
+        
+        Large JPEGs are decoded at reduced resolution close to target_size.
+        
+        Args:
+            data: Raw bytes of the image file
+            target_size: (width, height) to resize to, or None
+            upscale: Whether images smaller than target_size are enlarged
+        
+        Returns:
+            ImageContext: Context for the decoded image
+        """
+        return cls(decode_image(data, target_size), target_size, upscale)
+    
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) of the processed image."""
+        return self.bgr.shape[1], self.bgr.shape[0]
+    
+    @cached_property
+    def gray(self) -> np.ndarray:
+        """Grayscale view."""
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+    
+    @cached_property
+    def lab(self) -> np.ndarray:
+        """LAB view (used for CLAHE enhancement)."""
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2LAB)
+    
+    @cached_property
+    def hsv(self) -> np.ndarray:
+        """HSV view (used for saturation analysis)."""
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV)
@@ -0,0 +1,384 @@
+"""
+Image Reader Module
+Memory-mapped access to very large rasters (uncompressed or tiled
+TIFF/BigTIFF and NPY files) so pixel windows can be served without
+loading the whole image into RAM.
+
+Author: PM2.5 Estimation System
+"""
+
+import os
+import struct
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple, Union
+
+
+# Extensions that may be memory-mapped instead of decoded
+RASTER_EXTENSIONS = {'.npy', '.tif', '.tiff'}
+
+# Rasters with more pixels than this are downsampled band by band
+# instead of being materialised in memory (~150 MB as BGR)
+MAX_DIRECT_PIXELS = 50_000_000
+
+# Source bytes read at once by read_overview (~64 MB)
+MAX_BAND_BYTES = 64 * 1024 * 1024
+
+# TIFF tags used by the reader
+_TAG_IMAGE_WIDTH = 256
+_TAG_IMAGE_LENGTH = 257
+_TAG_BITS_PER_SAMPLE = 258
+_TAG_COMPRESSION = 259
+_TAG_PHOTOMETRIC = 262
+_TAG_STRIP_OFFSETS = 273
+_TAG_SAMPLES_PER_PIXEL = 277
+_TAG_ROWS_PER_STRIP = 278
+_TAG_STRIP_BYTE_COUNTS = 279
+_TAG_PLANAR_CONFIG = 284
+_TAG_TILE_WIDTH = 322
+_TAG_TILE_LENGTH = 323
+_TAG_TILE_OFFSETS = 324
+_TAG_TILE_BYTE_COUNTS = 325
+
+# TIFF field type -> (struct code, size in bytes) for the integer types
+_TIFF_TYPES = {
+    1: ('B', 1),   # BYTE
+    3: ('H', 2),   # SHORT
+    4: ('I', 4),   # LONG
+    16: ('Q', 8)   # LONG8 (BigTIFF)
+}
+
+
+def _read_tiff_tags(path: str) -> Dict[int, List[int]]:
+    """
+    Read the integer tags of the first image directory of a TIFF file.
+    
+    Both classic TIFF and BigTIFF, in either byte order, are supported.
+    
+    Args:
+        path: Path to the TIFF file
+    
+    Returns:
+        dict: Tag number -> list of values
+    
+    Raises:
+        ValueError: If the file is not a TIFF or its directory is truncated
+    """
+    try:
+        return _parse_tiff_tags(path)
+    except struct.error:
+        # Short reads of a truncated or damaged file
+        raise ValueError("Malformed TIFF")
+
+
+def _parse_tiff_tags(path: str) -> Dict[int, List[int]]:
+    """Parse the first image directory (see _read_tiff_tags)."""
+    with open(path, 'rb') as f:
+        header = f.read(16)
+        if header[:2] == b'II':
+            order = '<'
+        elif header[:2] == b'MM':
+            order = '>'
+        else:
+            raise ValueError("Not a TIFF file")
+        
+        version = struct.unpack(order + 'H', header[2:4])[0]
+        if version == 42:
+            ifd_offset = struct.unpack(order + 'I', header[4:8])[0]
+            count_format, entry_size, inline_size = 'H', 12, 4
+        elif version == 43:
+            ifd_offset = struct.unpack(order + 'Q', header[8:16])[0]
+            count_format, entry_size, inline_size = 'Q', 20, 8
+        else:
+            raise ValueError("Unsupported TIFF version")
+        
+        f.seek(ifd_offset)
+        count_size = struct.calcsize(count_format)
+        entry_count = struct.unpack(order + count_format, f.read(count_size))[0]
+        entries = f.read(entry_count * entry_size)
+        
+        tags = {}
+        for i in range(entry_count):
+            entry = entries[i * entry_size:(i + 1) * entry_size]
+            tag, field_type = struct.unpack(order + 'HH', entry[:4])
+            if field_type not in _TIFF_TYPES:
+                continue
+            
+            if version == 42:
+                count = struct.unpack(order + 'I', entry[4:8])[0]
+            else:
+                count = struct.unpack(order + 'Q', entry[4:12])[0]
+            value_field = entry[entry_size - inline_size:]
+            
+            code, size = _TIFF_TYPES[field_type]
+            if count * size <= inline_size:
+                data = value_field[:count * size]
+            else:
+                offset_format = 'I' if version == 42 else 'Q'
+                f.seek(struct.unpack(order + offset_format, value_field)[0])
+                data = f.read(count * size)
+            
+            tags[tag] = list(struct.unpack(f'{order}{count}{code}', data))
+    
+    return tags
+
+
+def _to_bgr(pixels: np.ndarray) -> np.ndarray:
+    """
+    Present an (H, W, samples) array as 3-channel BGR without copying.
+    
+    RGB(A) is reordered with a negative-stride view and grayscale is
+    broadcast to three channels with a zero stride.
+    
+    Args:
+        pixels: (H, W, samples) uint8 array (gray, RGB or RGBA)
+    
+    Returns:
+        np.ndarray: (H, W, 3) BGR view
+    """
+    if pixels.shape[2] == 1:
+        return np.broadcast_to(pixels, pixels.shape[:2] + (3,))
+    
+    return pixels[:, :, 2::-1]
+
+
+class ChunkedRasterReader:
+    """
+    Windowed reader for rasters stored as separate chunks (TIFF tiles
+    or non-contiguous strips).
+    
+    Every chunk is a zero-copy view into the memory-mapped file; a
+    window is assembled from only the chunks it overlaps. Supports
+    numpy-style slicing such as reader[y0:y1, x0:x1].
+    """
+    
+    dtype = np.dtype(np.uint8)
+    
+    def __init__(self, file_map: np.ndarray, size: Tuple[int, int], samples: int,
+                 chunk_size: Tuple[int, int], offsets: List[int],
+                 byte_counts: List[int]):
+        """
+        Initialize the reader.
+        
+        Args:
+            file_map: Whole file memory-mapped as uint8
+            size: (width, height) of the raster
+            samples: Samples per pixel
+            chunk_size: (width, height) of one chunk
+            offsets: Byte offset of every chunk, row-major
+            byte_counts: Byte count of every chunk
+        """
+        self.file_map = file_map
+        self.width, self.height = size
+        self.samples = samples
+        self.chunk_width, self.chunk_height = chunk_size
+        self.offsets = offsets
+        self.byte_counts = byte_counts
+        self.chunks_across = -(-self.width // self.chunk_width)
+    
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """Shape of the raster as a BGR image."""
+        return self.height, self.width, 3
+    
+    def _chunk(self, row: int, col: int) -> np.ndarray:
+        """Zero-copy (rows, chunk_width, samples) view of one chunk."""
+        index = row * self.chunks_across + col
+        start = self.offsets[index]
+        row_bytes = self.chunk_width * self.samples
+        rows = min(self.chunk_height, self.byte_counts[index] // row_bytes)
+        data = self.file_map[start:start + rows * row_bytes]
+        return data.reshape(rows, self.chunk_width, self.samples)
+    
+    def read_window(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        """
+        Read a pixel window.
+        
+        Args:
+            x, y: Top-left corner of the window
+            width, height: Window size (clipped to the raster)
+        
+        Returns:
+            np.ndarray: (height, width, 3) BGR window
+        """
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.width, x + width), min(self.height, y + height)
+        window = np.empty((max(0, y1 - y0), max(0, x1 - x0), self.samples), dtype=np.uint8)
+        
+        for row in range(y0 // self.chunk_height, -(-y1 // self.chunk_height)):
+            for col in range(x0 // self.chunk_width, -(-x1 // self.chunk_width)):
+                chunk = self._chunk(row, col)
+                cy, cx = row * self.chunk_height, col * self.chunk_width
+                top, bottom = max(y0, cy), min(y1, cy + chunk.shape[0])
+                left, right = max(x0, cx), min(x1, cx + self.chunk_width)
+                window[top - y0:bottom - y0, left - x0:right - x0] = \
+                    chunk[top - cy:bottom - cy, left - cx:right - cx]
+        
+        return np.ascontiguousarray(_to_bgr(window))
+    
+    def __getitem__(self, key) -> np.ndarray:
+        """Numpy-style row/column slicing, e.g. reader[y0:y1] or reader[y0:y1, x0:x1]."""
+        if not isinstance(key, tuple):
+            key = (key,)
+        rows = key[0] if len(key) > 0 else slice(None)
+        cols = key[1] if len(key) > 1 else slice(None)
+        
+        if not isinstance(rows, slice) or not isinstance(cols, slice):
+            raise TypeError("Only slices are supported")
+        y0, y1, y_step = rows.indices(self.height)
+        x0, x1, x_step = cols.indices(self.width)
+        if y_step != 1 or x_step != 1:
+            raise TypeError("Only contiguous slices are supported")
+        
+        window = self.read_window(x0, y0, x1 - x0, y1 - y0)
+        return window[(slice(None), slice(None)) + key[2:]]
+    
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        """Materialise the whole raster (only for small inputs)."""
+        return self.read_window(0, 0, self.width, self.height)
+
+
+# Anything returned by open_raster
+Raster = Union[np.ndarray, ChunkedRasterReader]
+
+
+def _open_tiff(path: str) -> Raster:
+    """
+    Memory-map an uncompressed 8-bit chunky TIFF/BigTIFF.
+    
+    Args:
+        path: Path to the TIFF file
+    
+    Returns:
+        Raster: Zero-copy BGR memmap view, or a ChunkedRasterReader
+    """
+    tags = _read_tiff_tags(path)
+    
+    def tag(number, default=None):
+        values = tags.get(number)
+        return values[0] if values else default
+    
+    width, height = tag(_TAG_IMAGE_WIDTH), tag(_TAG_IMAGE_LENGTH)
+    if not width or not height:
+        raise ValueError("Malformed TIFF: missing image dimensions")
+    samples = tag(_TAG_SAMPLES_PER_PIXEL, 1)
+    if tag(_TAG_COMPRESSION, 1) != 1:
+        raise ValueError("Compressed TIFFs cannot be memory-mapped")
+    if any(bits != 8 for bits in tags.get(_TAG_BITS_PER_SAMPLE, [8])):
+        raise ValueError("Only 8-bit TIFFs can be memory-mapped")
+    if tag(_TAG_PLANAR_CONFIG, 1) != 1 and samples > 1:
+        raise ValueError("Only chunky (interleaved) TIFFs can be memory-mapped")
+    if samples not in (1, 3, 4):
+        raise ValueError(f"Unsupported samples per pixel: {samples}")
+    if tag(_TAG_PHOTOMETRIC, 1) not in (1, 2):
+        raise ValueError("Only BlackIsZero gray and RGB TIFFs can be memory-mapped")
+    
+    file_map = np.memmap(path, dtype=np.uint8, mode='r')
+    
+    if _TAG_TILE_OFFSETS in tags:
+        if not tag(_TAG_TILE_WIDTH) or not tag(_TAG_TILE_LENGTH) or _TAG_TILE_BYTE_COUNTS not in tags:
+            raise ValueError("Malformed TIFF: incomplete tile layout")
+        return ChunkedRasterReader(
+            file_map, (width, height), samples,
+            (tag(_TAG_TILE_WIDTH), tag(_TAG_TILE_LENGTH)),
+            tags[_TAG_TILE_OFFSETS], tags[_TAG_TILE_BYTE_COUNTS]
+        )
+    
+    if _TAG_STRIP_OFFSETS not in tags or _TAG_STRIP_BYTE_COUNTS not in tags:
+        raise ValueError("Malformed TIFF: missing strip layout")
+    offsets = tags[_TAG_STRIP_OFFSETS]
+    byte_counts = tags[_TAG_STRIP_BYTE_COUNTS]
+    rows_per_strip = min(tag(_TAG_ROWS_PER_STRIP, height), height)
+    
+    # Strips written back to back form one contiguous array
+    contiguous = all(
+        offsets[i] + byte_counts[i] == offsets[i + 1] for i in range(len(offsets) - 1)
+    )
+    if contiguous and sum(byte_counts) >= width * height * samples:
+        pixels = file_map[offsets[0]:offsets[0] + width * height * samples]
+        return _to_bgr(pixels.reshape(height, width, samples))
+    
+    return ChunkedRasterReader(
+        file_map, (width, height), samples, (width, rows_per_strip),
+        offsets, byte_counts
+    )
+
+
+def open_raster(path: str) -> Raster:
+    """
+    Open a large raster for windowed, memory-mapped access.
+    
+    NPY files must hold an (H, W, 3) uint8 BGR array (or (H, W) gray);
+    TIFFs must be uncompressed 8-bit, strip or tile organised.
+    
+    Args:
+        path: Path to a .npy, .tif or .tiff file
+    
+    Returns:
+        Raster: (H, W, 3) BGR array-like supporting row/column slicing
+    """
+    extension = os.path.splitext(path)[1].lower()
+    
+    if extension == '.npy':
+        pixels = np.load(path, mmap_mode='r')
+        if pixels.dtype != np.uint8 or pixels.ndim not in (2, 3) or \
+                (pixels.ndim == 3 and pixels.shape[2] != 3):
+            raise ValueError("NPY rasters must be (H, W) or (H, W, 3) uint8 arrays")
+        if pixels.ndim == 2:
+            return np.broadcast_to(pixels[:, :, None], pixels.shape + (3,))
+        return pixels
+    
+    if extension in ('.tif', '.tiff'):
+        return _open_tiff(path)
+    
+    raise ValueError(f"Unsupported raster format: {extension}")
+
+
+def is_raster_path(path: str) -> bool:
+    """Check whether a path has an extension open_raster may handle."""
+    return os.path.splitext(path)[1].lower() in RASTER_EXTENSIONS
+
+
+def read_overview(raster: Raster, size: Tuple[int, int],
+                  band_rows: int = 64) -> np.ndarray:
+    """
+    Downsample a raster to size, reading it one horizontal band at a time.
+    
+    Source rows are read at most MAX_BAND_BYTES at a time: when an output
+    band covers more, its source rows are first narrowed to the output
+    width chunk by chunk and then reduced vertically.
+    
+    Args:
+        raster: Array-like returned by open_raster
+        size: Output (width, height)
+        band_rows: Output rows produced per band (bounds memory)
+    
+    Returns:
+        np.ndarray: (height, width, 3) BGR overview
+    """
+    height, width = raster.shape[:2]
+    out_width, out_height = size
+    overview = np.empty((out_height, out_width, 3), dtype=np.uint8)
+    chunk_rows = max(1, MAX_BAND_BYTES // (width * 3))
+    
+    for out_y in range(0, out_height, band_rows):
+        out_rows = min(band_rows, out_height - out_y)
+        y0 = out_y * height // out_height
+        y1 = max(y0 + 1, (out_y + out_rows) * height // out_height)
+        
+        if y1 - y0 <= chunk_rows:
+            band = np.ascontiguousarray(raster[y0:y1])
+        else:
+            band = np.empty((y1 - y0, out_width, 3), dtype=np.uint8)
+            for y in range(y0, y1, chunk_rows):
+                rows = min(chunk_rows, y1 - y)
+                band[y - y0:y - y0 + rows] = cv2.resize(
+                    np.ascontiguousarray(raster[y:y + rows]), (out_width, rows),
+                    interpolation=cv2.INTER_AREA
+                )
+        
+        overview[out_y:out_y + out_rows] = cv2.resize(
+            band, (out_width, out_rows), interpolation=cv2.INTER_AREA
+        )
+    
+    return overview
@@ -0,0 +1,357 @@
+"""
+Job Queue Module
+Runs analysis jobs on a local worker pool and tracks their status and
+partial results, so requests can return before the work is finished.
+
+Author: PM2.5 Estimation System
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Optional
+
+from feature_cache import _to_builtin
+
+
+class JobQueue:
+    """
+    Background job runner with pollable status.
+    
+    Each job record is kept in memory and mirrored to a JSON file in a
+    directory shared by every gunicorn worker, so a status request can
+    be answered by any worker, not only the one running the job.
+    """
+    
+    # Job states, in order
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    
+    # Seconds finished jobs stay available for polling
+    DEFAULT_TTL = 3600
+    
+    # Seconds between checks of a job record written by another process
+    POLL_INTERVAL = 0.05
+    
+    # Seconds without updates after which a job run by another worker
+    # process is presumed lost (that process died mid-job)
+    STALE_TIMEOUT = 300
+    
+    # Minimum seconds between scans of the jobs directory for expired records
+    PRUNE_INTERVAL = 60
+    
+    def __init__(self, jobs_dir: Optional[str] = 'data/jobs', workers: int = 2,
+                 ttl: float = DEFAULT_TTL):
+        """
+        Initialize the queue.
+        
+        Args:
+            jobs_dir: Directory for shared job records, or None to keep
+                      them in this process only
+            workers: Number of worker threads
+            ttl: Seconds finished jobs are kept
+        """
+        if workers < 1:
+            raise ValueError("Job queue needs at least one worker")
+        
+        self.jobs_dir = jobs_dir
+        self.ttl = ttl
+        self._jobs = {}
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis-job')
+        
+        if jobs_dir:
+            os.makedirs(jobs_dir, exist_ok=True)
+    
+    @staticmethod
+    def is_job_id(value: str) -> bool:
+        """
+        Check that a client-supplied string is a well-formed job id.
+        
+        Args:
+            value: Candidate id (e.g. from a URL)
+        
+        Returns:
+            bool: True for a 32-character lowercase hex id
+        """
+        return len(value) == 32 and all(c in '0123456789abcdef' for c in value)
+    
+    def _path(self, job_id: str) -> str:
+        """On-disk location of a job record."""
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+    
+    def _persist(self, job: Dict) -> None:
+        """Write a job record atomically (temporary file, then rename)."""
+        if not self.jobs_dir:
+            return
+        
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.jobs_dir, suffix='.part')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(job, f, default=_to_builtin)
+            os.replace(temp_path, self._path(job['id']))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"✗ Failed to persist job {job['id']}: {e}")
+            # Never leave a partial file in the shared directory
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass  # Already renamed or never fully created
+    
+    def _update(self, job_id: str, event: Optional[Dict] = None, **changes) -> None:
+        """
+        Apply changes to a job record and publish it.
+        
+        Args:
+            job_id: Job to update
+            event: Optional data of a progress event for changes['stage']
+            **changes: Record fields to set; 'result' is merged, not replaced
+        """
+        with self._lock:
+            job = self._jobs[job_id]
+            if 'result' in changes:
+                # Partial results accumulate
+                job['result'] = {**job['result'], **changes.pop('result')}
+            job.update(changes, updated=time.time())
+            if event is not None:
+                job['events'].append({'stage': job['stage'], 'data': event})
+            
+            # Written under the lock so an older state never overwrites a newer one
+            self._persist(job)
+            self._changed.notify_all()
+    
+    def _prune(self) -> None:
+        """
+        Forget jobs older than the TTL, in memory and on disk.
+        
+        The jobs directory is scanned by file age, so records left by
+        other or restarted worker processes expire too (at most once per
+        PRUNE_INTERVAL).
+        """
+        now = time.time()
+        cutoff = now - self.ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['status'] in (self.DONE, self.FAILED) and job['updated'] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            active = set(self._jobs)
+            
+            scan = self.jobs_dir and now - self._last_prune >= self.PRUNE_INTERVAL
+            if scan:
+                self._last_prune = now
+        
+        if not scan:
+            return
+        
+        try:
+            names = os.listdir(self.jobs_dir)
+        except OSError:
+            return
+        
+        for name in names:
+            # Job records and temporary files orphaned by a crash
+            job_id = name.split('.', 1)[0]
+            if job_id in active or not name.endswith(('.json', '.part')):
+                continue
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass  # Removed meanwhile by another worker
+    
+    def submit(self, func: Callable, *args, **kwargs) -> str:
+        """
+        Queue a job.
+        
+        func is called on a worker thread as func(*args, report=report,
+        **kwargs); it may call report(stage, partial_result_dict) to
+        publish progress, and its return value (a dict) becomes the
+        final result.
+        
+        Args:
+            func: Job function
+            *args, **kwargs: Arguments for func
+        
+        Returns:
+            str: Job id
+        """
+        self._prune()
+        
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': self.QUEUED,
+                'stage': self.QUEUED,
+                'result': {},
+                'error': None,
+                'events': [],
+                'created': now,
+                'updated': now
+            }
+        self._update(job_id)
+        
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        
+        return job_id
+    
+    def _run(self, job_id: str, func: Callable, args: tuple, kwargs: Dict) -> None:
+        """Execute a job on a worker thread, recording its outcome."""
+        self._update(job_id, event={}, status=self.RUNNING, stage='started')
+        
+        def report(stage: str, partial: Optional[Dict] = None) -> None:
+            self._update(job_id, event=partial or {}, stage=stage, result=partial or {})
+        
+        try:
+            result = func(*args, report=report, **kwargs) or {}
+            # The 'done' event refers to the result instead of storing it twice
+            self._update(job_id, event={}, status=self.DONE, stage=self.DONE, result=result)
+        except Exception as e:
+            print(f"✗ Job {job_id} failed: {e}")
+            self._update(job_id, event={'error': str(e)}, status=self.FAILED,
+                         stage=self.FAILED, error=str(e))
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Current record of a job.
+        
+        Args:
+            job_id: Id returned by submit()
+        
+        Returns:
+            dict: id, status, stage, result (partial until done), error,
+                  progress events (the 'done' event's data is the result),
+                  created and updated timestamps; None if unknown
+        """
+        self._prune()
+        
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return json.loads(json.dumps(job, default=_to_builtin))
+        
+        # Queued or finished by another worker process
+        if self.jobs_dir:
+            try:
+                with open(self._path(job_id), 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        
+        return None
+    
+    def wait(self, job_id: str, seen: int = 0, timeout: float = 15.0) -> Optional[Dict]:
+        """
+        Block until a job has more than `seen` events or has finished.
+        
+        Args:
+            job_id: Id returned by submit()
+            seen: Number of events the caller already has
+            timeout: Maximum seconds to wait
+        
+        Returns:
+            dict: Current job record (possibly unchanged after a timeout),
+                  or None if the job is unknown
+        """
+        def ready(job):
+            return job is None or len(job['events']) > seen or \
+                job['status'] in (self.DONE, self.FAILED)
+        
+        with self._changed:
+            running_here = job_id in self._jobs
+            if running_here:
+                self._changed.wait_for(lambda: ready(self._jobs.get(job_id)), timeout)
+        
+        if running_here:
+            return self.get(job_id)
+        
+        # Jobs run by another worker process: poll their record file
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while not ready(job) and time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            job = self.get(job_id)
+        
+        return job
+    
+    def _is_lost(self, job: Dict) -> bool:
+        """
+        Check whether an unfinished job belongs to a worker process that died.
+        
+        Args:
+            job: Job record from get()
+        
+        Returns:
+            bool: True if another process owns the job and has not
+                  updated it for STALE_TIMEOUT seconds
+        """
+        if job['status'] in (self.DONE, self.FAILED):
+            return False
+        
+        with self._lock:
+            if job['id'] in self._jobs:
+                return False
+        
+        return time.time() - job['updated'] > self.STALE_TIMEOUT
+    
+    def events(self, job_id: str, heartbeat: float = 15.0) -> Iterator[Optional[Dict]]:
+        """
+        Follow a job's progress events until it finishes.
+        
+        Events already emitted are replayed first, so late subscribers
+        see every stage. A job of another worker process that has not been
+        updated for STALE_TIMEOUT seconds ends the stream with a 'failed'
+        event instead of keep-alives forever.
+        
+        Args:
+            job_id: Id returned by submit()
+            heartbeat: Seconds without events after which None is yielded
+        
+        Yields:
+            dict: {'stage': ..., 'data': ...} per event ('done' carries the
+                  final result), or None as a keep-alive when nothing
+                  happened for `heartbeat` seconds
+        """
+        seen = 0
+        while True:
+            job = self.wait(job_id, seen, heartbeat)
+            if job is None:
+                return
+            
+            new_events = job['events'][seen:]
+            seen += len(new_events)
+            if not new_events:
+                yield None
+            for event in new_events:
+                if event['stage'] == self.DONE:
+                    event = {'stage': self.DONE, 'data': job['result']}
+                yield event
+            
+            if job['status'] in (self.DONE, self.FAILED):
+                return
+            
+            if self._is_lost(job):
+                yield {'stage': self.FAILED,
+                       'data': {'error': 'Job was lost: its worker process stopped responding'}}
+                return
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop accepting jobs and optionally wait for running ones.
+        
+        Args:
+            wait: Block until queued jobs have finished
+        """
+        self._executor.shutdown(wait=wait)
@@ -6,8 +6,15 @@ using empirically-calibrated formulas (no machine learning training required).
 Author: PM2.5 Estimation System
 """
 
+import bisect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
 import numpy as np
-from typing import Dict
+from typing import Dict, Mapping, Optional, Sequence, Union
 
 
 class PM25Estimator:
@@ -28,13 +35,126 @@ class PM25Estimator:
         'base_offset': 20           # Baseline PM2.5 level
     }
     
+    # Features _calculate_confidence reads; ImageAnalyzer.analyze(
+    # features=CONFIDENCE_FEATURES) computes just these
+    CONFIDENCE_FEATURES = ('haze_score', 'visibility', 'contrast')
+    
+    # Value assumed for a feature that is missing from the input
+    FEATURE_DEFAULTS = {
+        'haze_score': 50,
+        'turbidity': 50,
+        'visibility': 50,
+        'contrast': 50,
+        'brightness': 128,
+        'saturation': 128
+    }
+    
+    # Valid range of every feature
+    FEATURE_RANGES = {
+        'haze_score': (0, 100),
+        'turbidity': (0, 100),
+        'visibility': (0, 100),
+        'contrast': (0, 100),
+        'brightness': (0, 255),
+        'saturation': (0, 255)
+    }
+    
+    # Monte-Carlo uncertainty: assumed 1-sigma measurement noise of each
+    # feature (in feature units) and relative 1-sigma uncertainty of
+    # every weight, propagated through the full estimate
+    FEATURE_UNCERTAINTY = {
+        'haze_score': 3.0,
+        'turbidity': 2.0,
+        'visibility': 2.0,
+        'contrast': 2.0,
+        'brightness': 5.0,
+        'saturation': 5.0
+    }
+    COEFFICIENT_UNCERTAINTY = 0.1
+    UNCERTAINTY_SAMPLES = 2000
+    UNCERTAINTY_PERCENTILES = (5, 25, 50, 75, 95)
+    
+    # Piecewise-linear non-linear correction: the raw estimate keeps slope
+    # CORRECTION_SLOPES[i] between consecutive CORRECTION_BREAKPOINTS
+    CORRECTION_BREAKPOINTS = (50, 150)
+    CORRECTION_SLOPES = (1.0, 0.9, 0.6)
+    
     # Realistic PM2.5 ranges (µg/m³)
     MIN_PM25 = 0
     MAX_PM25 = 300
     
-    def __init__(self):
-        """Initialize the PM2.5 estimator."""
-        pass
+    # EPA AQI categories: AQI_BREAKPOINTS[i] is the inclusive upper PM2.5
+    # bound of category i; anything above the last one is Hazardous
+    AQI_BREAKPOINTS = (12, 35.4, 55.4, 150.4, 250.4)
+    AQI_CATEGORIES = (
+        'Good',
+        'Moderate',
+        'Unhealthy for Sensitive Groups',
+        'Unhealthy',
+        'Very Unhealthy',
+        'Hazardous'
+    )
+    AQI_COLORS = ('#00E400', '#FFFF00', '#FF7E00', '#FF0000', '#8F3F97', '#7E0023')
+    AQI_ADVICE = (
+        'Air quality is satisfactory, and air pollution poses little or no risk.',
+        'Air quality is acceptable. However, there may be a risk for some people.',
+        'Members of sensitive groups may experience health effects.',
+        'Everyone may begin to experience health effects.',
+        'Health alert: everyone may experience more serious health effects.',
+        'Health warning of emergency conditions. Entire population is likely affected.'
+    )
+    
+    # Preallocated per-category results and array forms of the tables
+    # above for vectorized lookups; both share the same string objects
+    _AQI_INFO = tuple(
+        {'category': category, 'color': color, 'advice': advice}
+        for category, color, advice in zip(AQI_CATEGORIES, AQI_COLORS, AQI_ADVICE)
+    )
+    _AQI_BREAKPOINT_ARRAY = np.asarray(AQI_BREAKPOINTS, dtype=np.float64)
+    _AQI_TABLES = {
+        'category': np.array(AQI_CATEGORIES, dtype=object),
+        'color': np.array(AQI_COLORS, dtype=object),
+        'advice': np.array(AQI_ADVICE, dtype=object)
+    }
+    
+    # Calibrated coefficient set written by calibration.py; the built-in
+    # values above are used while it does not exist
+    COEFFICIENTS_FILE = os.path.join('data', 'pm25_coefficients.json')
+    
+    def __init__(self, coefficients_file: Optional[str] = COEFFICIENTS_FILE):
+        """
+        Initialize the PM2.5 estimator.
+        
+        The current coefficient set of the file is pinned for the lifetime
+        of the estimator, so one request never mixes two versions even if
+        the file is replaced while it runs.
+        
+        Args:
+            coefficients_file: Versioned coefficient file to use while it
+                               exists, or None to use the built-in values
+        """
+        self.coefficient_version = 'builtin'
+        
+        if coefficients_file:
+            coefficient_set = CoefficientStore.for_file(coefficients_file).current()
+            if coefficient_set is not None:
+                self._apply_coefficients(coefficient_set)
+    
+    def load_coefficients(self, path: str) -> None:
+        """
+        Replace the weights and correction curve with a calibrated set.
+        
+        Args:
+            path: Coefficient file written by write_coefficient_file()
+        """
+        self._apply_coefficients(read_coefficient_file(path))
+    
+    def _apply_coefficients(self, coefficient_set: Dict[str, object]) -> None:
+        """Use a parsed coefficient set for this estimator."""
+        self.COEFFICIENTS = coefficient_set['coefficients']
+        self.CORRECTION_BREAKPOINTS = coefficient_set['breakpoints']
+        self.CORRECTION_SLOPES = coefficient_set['slopes']
+        self.coefficient_version = coefficient_set['version']
     
     def estimate(self, features: Dict[str, float]) -> float:
         """
@@ -52,56 +172,149 @@ class PM25Estimator:
         Returns:
             float: Estimated PM2.5 concentration in µg/m³
         """
-        # Extract features
-        haze = features.get('haze_score', 50)
-        turbidity = features.get('turbidity', 50)
-        visibility = features.get('visibility', 50)
-        contrast = features.get('contrast', 50)
-        brightness = features.get('brightness', 128)
-        saturation = features.get('saturation', 128)
+        pm25 = self.estimate_array(features, decimals=None)
+        
+        return round(float(pm25), 2)
+    
+    def estimate_array(self, features: Union[Mapping[str, object], np.ndarray],
+                       decimals: Optional[int] = 2,
+                       coefficients: Optional[Mapping[str, object]] = None) -> np.ndarray:
+        """
+        Estimate PM2.5 for whole columns of features at once.
+        
+        The weighted sum, piecewise correction and clamp are all array
+        operations, so scoring millions of tiles or raster cells costs a
+        few NumPy passes instead of a Python call per value.
+        
+        Args:
+            features: Feature name -> array-like (e.g. from
+                      ImageAnalyzer.analyze_batch) or a structured array
+                      with feature-named fields; missing features take
+                      FEATURE_DEFAULTS
+            decimals: Round to this many decimals (None to skip rounding)
+            coefficients: Weights to use instead of COEFFICIENTS; values
+                          may be arrays that broadcast with the features
+        
+        Returns:
+            np.ndarray: PM2.5 in µg/m³, broadcast shape of the inputs
+        """
+        columns = self._feature_columns(features)
+        weights = self.COEFFICIENTS if coefficients is None else coefficients
         
         # Normalize brightness and saturation to 0-100 scale
-        brightness_norm = (brightness / 255) * 100
-        saturation_norm = (saturation / 255) * 100
-        
-        # Calculate PM2.5 using weighted formula
-        pm25 = self.COEFFICIENTS['base_offset']
-        pm25 += self.COEFFICIENTS['haze_weight'] * haze
-        pm25 += self.COEFFICIENTS['turbidity_weight'] * turbidity
-        pm25 += self.COEFFICIENTS['visibility_weight'] * visibility
-        pm25 += self.COEFFICIENTS['contrast_weight'] * contrast
-        pm25 += self.COEFFICIENTS['brightness_weight'] * brightness_norm
-        pm25 += self.COEFFICIENTS['saturation_weight'] * saturation_norm
+        brightness_norm = (columns['brightness'] / 255) * 100
+        saturation_norm = (columns['saturation'] / 255) * 100
+        
+        # Weighted formula, accumulated in the same order as the
+        # original scalar version so results are bit-identical
+        pm25 = weights['base_offset'] + weights['haze_weight'] * columns['haze_score']
+        pm25 = pm25 + weights['turbidity_weight'] * columns['turbidity']
+        pm25 = pm25 + weights['visibility_weight'] * columns['visibility']
+        pm25 = pm25 + weights['contrast_weight'] * columns['contrast']
+        pm25 = pm25 + weights['brightness_weight'] * brightness_norm
+        pm25 = pm25 + weights['saturation_weight'] * saturation_norm
         
         # Apply non-linear scaling for realism
-        # Real PM2.5 doesn't scale perfectly linearly
         pm25 = self._apply_nonlinear_correction(pm25)
         
         # Clamp to realistic range
-        pm25 = max(self.MIN_PM25, min(self.MAX_PM25, pm25))
+        pm25 = np.clip(pm25, self.MIN_PM25, self.MAX_PM25)
         
-        return round(pm25, 2)
+        if decimals is not None:
+            pm25 = np.round(pm25, decimals)
+        
+        return pm25
     
-    def _apply_nonlinear_correction(self, raw_pm25: float) -> float:
+    def estimate_uncertainty(self, features: Union[Mapping[str, object], np.ndarray],
+                             samples: int = UNCERTAINTY_SAMPLES,
+                             seed: Optional[int] = 0) -> Dict[str, object]:
+        """
+        Monte-Carlo uncertainty band for PM2.5 estimates.
+        
+        Features and weights are perturbed with FEATURE_UNCERTAINTY and
+        COEFFICIENT_UNCERTAINTY, and every sample is evaluated in a single
+        estimate_array() call, which takes a few milliseconds per image.
+        
+        Args:
+            features: Feature dict of one image, or feature columns of
+                      several images (one band per image)
+            samples: Number of Monte-Carlo samples
+            seed: Random seed (fixed by default so bands are reproducible)
+        
+        Returns:
+            dict: 'p5' ... 'p95' percentiles and 'std' of the sampled
+                  PM2.5 (floats for one image, arrays for columns)
+        """
+        columns = self._feature_columns(features)
+        shape = np.broadcast_shapes(*(column.shape for column in columns.values()))
+        rng = np.random.default_rng(seed)
+        
+        perturbed = {}
+        for name, column in columns.items():
+            noise = rng.standard_normal((samples,) + shape) * self.FEATURE_UNCERTAINTY.get(name, 0)
+            perturbed[name] = np.clip(column + noise, *self.FEATURE_RANGES[name])
+        
+        # One weight draw per sample, shared by all images of that sample
+        weight_shape = (samples,) + (1,) * len(shape)
+        coefficients = {
+            name: value * (1 + self.COEFFICIENT_UNCERTAINTY * rng.standard_normal(weight_shape))
+            for name, value in self.COEFFICIENTS.items()
+        }
+        
+        pm25 = self.estimate_array(perturbed, decimals=None, coefficients=coefficients)
+        bands = np.percentile(pm25, self.UNCERTAINTY_PERCENTILES, axis=0)
+        
+        result = {f'p{percentile}': np.round(band, 2)
+                  for percentile, band in zip(self.UNCERTAINTY_PERCENTILES, bands)}
+        result['std'] = np.round(pm25.std(axis=0), 2)
+        
+        if not shape:
+            result = {name: float(value) for name, value in result.items()}
+        
+        return result
+    
+    def _feature_columns(self, features: Union[Mapping[str, object], np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Turn a feature mapping or structured array into float64 columns.
+        
+        Args:
+            features: Feature name -> scalar/array-like, or a structured array
+        
+        Returns:
+            dict: Feature name -> float64 array for every FEATURE_DEFAULTS key
+        """
+        names = features.dtype.names if isinstance(features, np.ndarray) else features
+        if names is None:
+            raise ValueError("Expected a feature mapping or a structured array")
+        
+        return {
+            name: np.asarray(features[name] if name in names else default, dtype=np.float64)
+            for name, default in self.FEATURE_DEFAULTS.items()
+        }
+    
+    def _apply_nonlinear_correction(self, raw_pm25: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
         """
         Apply non-linear correction to make estimates more realistic.
         
+        Low values stay linear; above each breakpoint the slope drops,
+        compressing extreme values to avoid unrealistic spikes.
+        
         Args:
-            raw_pm25: Raw calculated PM2.5 value
+            raw_pm25: Raw calculated PM2.5 value(s)
             
         Returns:
-            float: Corrected PM2.5 value
-        """
-        # Use sigmoid-like curve to smooth extreme values
-        if raw_pm25 < 50:
-            # Low pollution range - linear
-            return raw_pm25
-        elif raw_pm25 < 150:
-            # Moderate range - slight compression
-            return 50 + (raw_pm25 - 50) * 0.9
-        else:
-            # High pollution - more compression to avoid unrealistic spikes
-            return 140 + (raw_pm25 - 150) * 0.6
+            Corrected PM2.5 value(s), same shape as the input
+        """
+        breakpoints = np.asarray(self.CORRECTION_BREAKPOINTS, dtype=np.float64)
+        slopes = np.asarray(self.CORRECTION_SLOPES, dtype=np.float64)
+        
+        # Start (raw, corrected) of every segment; the curve is continuous
+        starts = np.concatenate(([0.0], breakpoints))
+        offsets = np.concatenate(([0.0], np.cumsum(np.diff(starts) * slopes[:-1])))
+        
+        segment = np.searchsorted(breakpoints, raw_pm25, side='right')
+        
+        return offsets[segment] + (raw_pm25 - starts[segment]) * slopes[segment]
     
     def get_aqi_category(self, pm25: float) -> Dict[str, str]:
         """
@@ -113,43 +326,46 @@ class PM25Estimator:
             
         Returns:
             dict: Category and health advice
+        
+        Raises:
+            ValueError: If pm25 is NaN or infinite
         """
-        if pm25 <= 12:
-            return {
-                'category': 'Good',
-                'color': '#00E400',
-                'advice': 'Air quality is satisfactory, and air pollution poses little or no risk.'
-            }
-        elif pm25 <= 35.4:
-            return {
-                'category': 'Moderate',
-                'color': '#FFFF00',
-                'advice': 'Air quality is acceptable. However, there may be a risk for some people.'
-            }
-        elif pm25 <= 55.4:
-            return {
-                'category': 'Unhealthy for Sensitive Groups',
-                'color': '#FF7E00',
-                'advice': 'Members of sensitive groups may experience health effects.'
-            }
-        elif pm25 <= 150.4:
-            return {
-                'category': 'Unhealthy',
-                'color': '#FF0000',
-                'advice': 'Everyone may begin to experience health effects.'
-            }
-        elif pm25 <= 250.4:
-            return {
-                'category': 'Very Unhealthy',
-                'color': '#8F3F97',
-                'advice': 'Health alert: everyone may experience more serious health effects.'
-            }
-        else:
-            return {
-                'category': 'Hazardous',
-                'color': '#7E0023',
-                'advice': 'Health warning of emergency conditions. Entire population is likely affected.'
-            }
+        if not math.isfinite(pm25):
+            raise ValueError(f"PM2.5 must be a finite number, got {pm25}")
+        
+        # Copy so callers may modify the result without touching the table
+        return self._AQI_INFO[bisect.bisect_left(self.AQI_BREAKPOINTS, pm25)].copy()
+    
+    def get_aqi_index(self, pm25: Union[float, np.ndarray]) -> np.ndarray:
+        """
+        Classify whole arrays of PM2.5 values into AQI category indices.
+        
+        Index into AQI_CATEGORIES, AQI_COLORS and AQI_ADVICE (or the
+        arrays from get_aqi_tables()) to get names, colors and advice.
+        
+        Args:
+            pm25: PM2.5 concentration(s) in µg/m³
+            
+        Returns:
+            np.ndarray: uint8 category indices, same shape as the input
+        
+        Raises:
+            ValueError: If any value is NaN or infinite (as get_aqi_category)
+        """
+        pm25 = np.asarray(pm25, dtype=np.float64)
+        if not np.isfinite(pm25).all():
+            raise ValueError("PM2.5 values must be finite numbers")
+        
+        return np.searchsorted(self._AQI_BREAKPOINT_ARRAY, pm25, side='left').astype(np.uint8)
+    
+    def get_aqi_tables(self) -> Dict[str, np.ndarray]:
+        """
+        Preallocated AQI lookup tables for fancy indexing with get_aqi_index().
+        
+        Returns:
+            dict: 'category', 'color' and 'advice' object arrays
+        """
+        return self._AQI_TABLES
     
     def estimate_with_confidence(self, features: Dict[str, float]) -> Dict[str, any]:
         """
@@ -172,6 +388,7 @@ class PM25Estimator:
         
         return {
             'pm25': pm25,
+            'coefficient_version': self.coefficient_version,
             'confidence': confidence,
             'aqi_category': aqi_info['category'],
             'aqi_color': aqi_info['color'],
@@ -189,29 +406,240 @@ class PM25Estimator:
         Returns:
             float: Confidence score (0-100%)
         """
+        confidence = self.calculate_confidence_array(features, decimals=None)
+        
+        return float(round(float(confidence), 1))
+    
+    def calculate_confidence_array(self, features: Union[Mapping[str, object], np.ndarray],
+                                   decimals: Optional[int] = 1) -> np.ndarray:
+        """
+        Calculate confidence scores for whole columns of features at once.
+        
+        Args:
+            features: Feature name -> array-like or a structured array
+                      (only haze_score, visibility and contrast are read)
+            decimals: Round to this many decimals (None to skip rounding)
+            
+        Returns:
+            np.ndarray: Confidence scores (0-100%), broadcast shape of the inputs
+        """
         # Check if features are consistent with each other
         # High haze + low visibility + low contrast = high confidence
         # Contradicting features = lower confidence
-        
-        haze = features.get('haze_score', 50)
-        visibility = features.get('visibility', 50)
-        contrast = features.get('contrast', 50)
+        columns = self._feature_columns(features)
         
         # Normalize to pollution indicators (higher = more pollution)
-        pollution_indicators = [
-            haze,
-            100 - visibility,
-            100 - contrast
-        ]
+        haze = columns['haze_score']
+        low_visibility = 100 - columns['visibility']
+        low_contrast = 100 - columns['contrast']
         
-        # Calculate standard deviation - lower = more consistent
-        std_dev = np.std(pollution_indicators)
+        # Population standard deviation of the three indicators - lower =
+        # more consistent. Written out with the same operation order as
+        # np.std so results match the per-image version exactly.
+        mean = (haze + low_visibility + low_contrast) / 3
+        deviation_sq = (haze - mean) ** 2
+        deviation_sq = deviation_sq + (low_visibility - mean) ** 2
+        deviation_sq = deviation_sq + (low_contrast - mean) ** 2
+        std_dev = np.sqrt(deviation_sq / 3)
         
         # Convert to confidence (0-100%)
         # Low std_dev = high confidence
-        confidence = max(50, 100 - float(std_dev))
+        confidence = np.maximum(50, 100 - std_dev)
+        
+        if decimals is not None:
+            confidence = np.round(confidence, decimals)
+        
+        return confidence
+
+
+class CoefficientStore:
+    """
+    Keeps the parsed coefficient set of one file and swaps in a new one
+    when the file changes, so gunicorn workers pick up a recalibration
+    without restarting.
+    
+    The file is checked with a cheap stat() at most every CHECK_INTERVAL
+    seconds. Only the thread that notices a change re-reads it; all other
+    requests keep using the previous set until the new one is ready.
+    """
+    
+    # Seconds between checks of the coefficient file
+    CHECK_INTERVAL = 1.0
+    
+    _stores = {}
+    _stores_lock = threading.Lock()
+    
+    def __init__(self, path: str):
+        """
+        Initialize the store.
+        
+        Args:
+            path: Coefficient file to watch
+        """
+        self.path = path
+        self._coefficient_set = None
+        self._signature = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def for_file(cls, path: str) -> 'CoefficientStore':
+        """
+        Get the process-wide store for a coefficient file.
+        
+        Args:
+            path: Coefficient file path
+        
+        Returns:
+            CoefficientStore: Shared store for that file
+        """
+        key = os.path.abspath(path)
+        store = cls._stores.get(key)
+        if store is None:
+            with cls._stores_lock:
+                store = cls._stores.setdefault(key, cls(path))
         
-        return float(round(confidence, 1))
+        return store
+    
+    def current(self) -> Optional[Dict[str, object]]:
+        """
+        Current coefficient set, reloading it first if the file changed.
+        
+        Returns:
+            dict: Parsed coefficient set (treat as read-only), or None
+                  while the file does not exist
+        """
+        now = time.monotonic()
+        if self._checked_at is None:
+            # First use: wait for the initial load
+            with self._lock:
+                if self._checked_at is None:
+                    self._refresh(now)
+        elif now - self._checked_at >= self.CHECK_INTERVAL and self._lock.acquire(blocking=False):
+            try:
+                self._refresh(now)
+            finally:
+                self._lock.release()
+        
+        return self._coefficient_set
+    
+    def _refresh(self, now: float) -> None:
+        """
+        Reload the file if its identity, size or mtime changed (lock held).
+        
+        The check time is recorded only once the (re)load has finished, so
+        first-use callers keep waiting on the lock until a set is loaded.
+        """
+        try:
+            self._reload()
+        finally:
+            self._checked_at = now
+    
+    def _reload(self) -> None:
+        """Re-read the coefficient file when its signature changed (lock held)."""
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            signature = None
+        
+        if signature == self._signature:
+            return
+        
+        self._signature = signature
+        if signature is None:
+            if self._coefficient_set is not None:
+                print(f"✓ Coefficient file {self.path} removed, using built-in coefficients")
+            self._coefficient_set = None
+            return
+        
+        try:
+            coefficient_set = read_coefficient_file(self.path)
+        except (OSError, ValueError) as e:
+            # Keep serving the previous set rather than failing requests
+            print(f"✗ Ignoring coefficient file {self.path}: {e}")
+            return
+        
+        # A single reference assignment: readers see the old or the new set
+        self._coefficient_set = coefficient_set
+        print(f"✓ Loaded coefficient set {coefficient_set['version']} from {self.path}")
+
+
+def read_coefficient_file(path: str) -> Dict[str, object]:
+    """
+    Read and validate a versioned coefficient file.
+    
+    Args:
+        path: Path to the JSON coefficient file
+    
+    Returns:
+        dict: version, coefficients, breakpoints and slopes
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    
+    try:
+        coefficients = {
+            name: float(data['coefficients'][name]) for name in PM25Estimator.COEFFICIENTS
+        }
+        breakpoints = tuple(float(value) for value in data['correction']['breakpoints'])
+        slopes = tuple(float(value) for value in data['correction']['slopes'])
+        version = str(data['version'])
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Malformed coefficient file: missing {e}")
+    
+    if len(slopes) != len(breakpoints) + 1:
+        raise ValueError("Expected exactly one more correction slope than breakpoints")
+    if any(later <= earlier for earlier, later in zip(breakpoints, breakpoints[1:])):
+        raise ValueError("Correction breakpoints must be strictly increasing")
+    if not np.all(np.isfinite(list(coefficients.values()) + list(breakpoints) + list(slopes))):
+        raise ValueError("Coefficients must be finite numbers")
+    
+    return {
+        'version': version,
+        'coefficients': coefficients,
+        'breakpoints': breakpoints,
+        'slopes': slopes
+    }
+
+
+def write_coefficient_file(path: str, coefficients: Dict[str, float],
+                           breakpoints: Sequence[float], slopes: Sequence[float],
+                           version: str, metadata: Optional[Dict[str, object]] = None) -> None:
+    """
+    Write a versioned coefficient file atomically.
+    
+    The file is written under a temporary name and renamed into place,
+    so estimators never read a partially written set.
+    
+    Args:
+        path: Destination JSON path
+        coefficients: Weight name -> value (same keys as COEFFICIENTS)
+        breakpoints: Correction breakpoints (raw PM2.5)
+        slopes: Correction slopes, one more than breakpoints
+        version: Version identifier reported with every estimate
+        metadata: Optional extra information (fit metrics, data used)
+    """
+    data = {
+        'version': version,
+        'coefficients': {name: float(coefficients[name]) for name in PM25Estimator.COEFFICIENTS},
+        'correction': {
+            'breakpoints': [float(value) for value in breakpoints],
+            'slopes': [float(value) for value in slopes]
+        },
+        'metadata': metadata or {}
+    }
+    
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
 
 
 def estimate_pm25(features: Dict[str, float]) -> Dict[str, any]:
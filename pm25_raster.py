@@ -0,0 +1,176 @@
+"""
+PM2.5 Raster Module
+Produces a spatial PM2.5 grid by sliding a window over a satellite
+image and estimating PM2.5 for every window.
+
+Author: PM2.5 Estimation System
+"""
+
+import numpy as np
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+from image_analysis import ImageAnalyzer, FEATURE_NAMES
+from image_context import ImageContext, read_image
+from image_reader import is_raster_path, open_raster
+from pm25_estimator import PM25Estimator
+
+
+class RasterEstimator:
+    """
+    Estimates a PM2.5 grid over an image, one horizontal strip of
+    windows at a time so memory stays bounded for large mosaics.
+    """
+    
+    # Default window: one 256x256 z15 tile, the size the native-resolution
+    # feature normalization was fitted on
+    DEFAULT_WINDOW = 256
+    
+    def __init__(self, window: int = DEFAULT_WINDOW, stride: Optional[int] = None,
+                 estimator: Optional[PM25Estimator] = None):
+        """
+        Initialize the raster estimator.
+        
+        Args:
+            window: Side length of the square analysis window in pixels
+            stride: Step between windows (defaults to window, no overlap)
+            estimator: PM25Estimator to use (a new one by default)
+        """
+        if window < 3:
+            raise ValueError("Window must be at least 3 pixels")
+        if stride is not None and stride < 1:
+            raise ValueError("Stride must be at least 1 pixel")
+        
+        self.window = window
+        self.stride = stride or window
+        self.estimator = estimator or PM25Estimator()
+    
+    def _offsets(self, length: int) -> np.ndarray:
+        """
+        Window start offsets along one axis.
+        
+        The last window is aligned with the image edge so every pixel
+        is covered even when the length is not a multiple of the stride.
+        
+        Args:
+            length: Image height or width in pixels
+        
+        Returns:
+            np.ndarray: Start offsets
+        """
+        if length < self.window:
+            raise ValueError(f"Image is smaller than the {self.window}px window")
+        
+        offsets = np.arange(0, length - self.window + 1, self.stride)
+        if offsets[-1] != length - self.window:
+            offsets = np.append(offsets, length - self.window)
+        
+        return offsets
+    
+    def _open(self, image_path: str):
+        """
+        Open an image path, memory-mapping it when the format allows.
+        
+        Args:
+            image_path: Path to the image
+        
+        Returns:
+            BGR array, memmap or windowed raster reader
+        """
+        if is_raster_path(image_path):
+            try:
+                return open_raster(image_path)
+            except ValueError:
+                pass  # Compressed or unusual layout: decode normally
+        
+        return read_image(image_path)
+    
+    def iter_strips(self, image) -> Iterator[Tuple[int, Dict[str, np.ndarray], np.ndarray]]:
+        """
+        Estimate PM2.5 strip by strip.
+        
+        Only the rows of the current strip are read from the image, so
+        memory-mapped inputs are paged in one strip at a time.
+        
+        Args:
+            image: (H, W, 3) uint8 BGR array or any array-like supporting
+                   row slicing (e.g. a numpy memmap)
+        
+        Yields:
+            tuple: (row index, feature name -> (cols,) array, (cols,) PM2.5)
+        """
+        height, width = image.shape[:2]
+        row_offsets = self._offsets(height)
+        col_offsets = self._offsets(width)
+        
+        for row, y in enumerate(row_offsets):
+            strip = np.asarray(image[y:y + self.window])
+            
+            # (cols, window, window, 3) stack of this strip's windows
+            windows = np.lib.stride_tricks.sliding_window_view(
+                strip, (self.window, self.window), axis=(0, 1)
+            )[0, col_offsets].transpose(0, 2, 3, 1)
+            
+            features = ImageAnalyzer.analyze_batch(
+                np.ascontiguousarray(windows), native_resolution=True
+            )
+            
+            pm25 = self.estimator.estimate_array(features)
+            
+            yield row, features, pm25
+    
+    def estimate(self, image: Union[str, np.ndarray, ImageContext]) -> Dict[str, object]:
+        """
+        Estimate the full PM2.5 grid for an image.
+        
+        Args:
+            image: Image path, BGR array (or memmap) or ImageContext;
+                   uncompressed TIFF and NPY paths are memory-mapped
+        
+        Returns:
+            dict: PM2.5 grid, AQI category index grid (see
+                  PM25Estimator.get_aqi_tables), confidence grid,
+                  per-window feature grids and window geometry
+        """
+        if isinstance(image, str):
+            image = self._open(image)
+        elif isinstance(image, ImageContext):
+            image = image.bgr
+        
+        height, width = image.shape[:2]
+        rows = len(self._offsets(height))
+        cols = len(self._offsets(width))
+        
+        pm25_grid = np.empty((rows, cols), dtype=np.float64)
+        feature_grids = {name: np.empty((rows, cols), dtype=np.float64) for name in FEATURE_NAMES}
+        
+        for row, features, pm25 in self.iter_strips(image):
+            pm25_grid[row] = pm25
+            for name in FEATURE_NAMES:
+                feature_grids[name][row] = features[name]
+        
+        return {
+            'pm25': pm25_grid,
+            'aqi_index': self.estimator.get_aqi_index(pm25_grid),
+            'confidence': self.estimator.calculate_confidence_array(feature_grids),
+            'features': feature_grids,
+            'window': self.window,
+            'stride': self.stride,
+            'image_size': (width, height)
+        }
+
+
+def estimate_raster(image: Union[str, np.ndarray, ImageContext],
+                    window: int = RasterEstimator.DEFAULT_WINDOW,
+                    stride: Optional[int] = None) -> Dict[str, object]:
+    """
+    Convenience function to estimate a PM2.5 grid for an image.
+    
+    Args:
+        image: Image path, BGR array (or memmap) or ImageContext
+        window: Side length of the square analysis window in pixels
+        stride: Step between windows (defaults to window)
+    
+    Returns:
+        dict: PM2.5 grid, per-window feature grids and window geometry
+    """
+    return RasterEstimator(window, stride).estimate(image)
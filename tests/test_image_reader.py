@@ -0,0 +1,96 @@
+"""
+Tests for the memory-mapped raster reader.
+
+Run: python -m unittest discover tests
+
+Author: PM2.5 Estimation System
+"""
+
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_context import ImageContext
+import image_reader
+from image_reader import open_raster, read_overview
+
+
+class MalformedTiffTest(unittest.TestCase):
+    """Damaged TIFFs must fail with ValueError, like any undecodable image."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+    
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+    
+    def valid_tiff(self) -> bytes:
+        image = np.random.default_rng(0).integers(0, 256, (32, 48, 3), dtype=np.uint8)
+        ok, encoded = cv2.imencode('.tif', image, [cv2.IMWRITE_TIFF_COMPRESSION, 1])
+        self.assertTrue(ok)
+        return encoded.tobytes()
+    
+    def test_valid_tiff_is_memory_mapped(self):
+        path = self.write('valid.tif', self.valid_tiff())
+        self.assertEqual(open_raster(path).shape, (32, 48, 3))
+    
+    def test_truncated_tiff_raises_value_error(self):
+        data = self.valid_tiff()
+        # Cut inside the header, and inside the image directory
+        ifd_offset = struct.unpack('<I', data[4:8])[0] if data[:2] == b'II' else \
+            struct.unpack('>I', data[4:8])[0]
+        for length in (6, ifd_offset + 1, ifd_offset + 10):
+            path = self.write(f'truncated_{length}.tif', data[:length])
+            with self.assertRaises(ValueError):
+                open_raster(path)
+            with self.assertRaises(ValueError):
+                ImageContext.from_path(path)
+    
+    def test_tiff_without_dimensions_raises_value_error(self):
+        # Little-endian classic TIFF whose only tag is Compression = 1
+        data = b'II' + struct.pack('<HI', 42, 8) + struct.pack('<H', 1) + \
+            struct.pack('<HHII', 259, 3, 1, 1) + struct.pack('<I', 0)
+        path = self.write('no_dimensions.tif', data)
+        with self.assertRaises(ValueError):
+            open_raster(path)
+        with self.assertRaises(ValueError):
+            ImageContext.from_path(path)
+
+    
+    def test_four_channel_npy_is_rejected(self):
+        path = os.path.join(self.directory.name, 'rgba.npy')
+        np.save(path, np.zeros((8, 8, 4), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            open_raster(path)
+
+
+class ReadOverviewTest(unittest.TestCase):
+    """Bands taller than MAX_BAND_BYTES are read in chunks with the same result."""
+    
+    def test_chunked_overview_matches_area_resize(self):
+        image = cv2.resize(
+            np.random.default_rng(0).integers(0, 256, (60, 50, 3), dtype=np.uint8), (2000, 3000)
+        )
+        expected = cv2.resize(image, (400, 300), interpolation=cv2.INTER_AREA).astype(int)
+        
+        original = image_reader.MAX_BAND_BYTES
+        image_reader.MAX_BAND_BYTES = 2000 * 3 * 7  # 7 source rows per read
+        self.addCleanup(setattr, image_reader, 'MAX_BAND_BYTES', original)
+        
+        overview = read_overview(image, (400, 300))
+        self.assertLessEqual(np.abs(overview.astype(int) - expected).max(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+Tests for AQI classification in the PM2.5 estimator.
+
+Run: python -m unittest discover tests
+
+Author: PM2.5 Estimation System
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pm25_estimator import PM25Estimator
+
+
+class AqiClassificationTest(unittest.TestCase):
+    """The scalar and array AQI paths must agree, including on bad input."""
+    
+    def setUp(self):
+        self.estimator = PM25Estimator(coefficients_file=None)
+    
+    def test_scalar_and_array_paths_agree(self):
+        values = [0.0, 12.0, 12.1, 35.4, 55.4, 100.0, 150.4, 250.4, 250.5, 900.0]
+        indices = self.estimator.get_aqi_index(np.array(values))
+        for value, index in zip(values, indices):
+            self.assertEqual(self.estimator.get_aqi_category(value)['category'],
+                             PM25Estimator.AQI_CATEGORIES[index])
+    
+    def test_non_finite_pm25_is_rejected(self):
+        for value in (float('nan'), float('inf'), -float('inf')):
+            with self.assertRaises(ValueError):
+                self.estimator.get_aqi_category(value)
+            with self.assertRaises(ValueError):
+                self.estimator.get_aqi_index(np.array([10.0, value]))
+            with self.assertRaises(ValueError):
+                self.estimator.get_aqi_index(value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -66,7 +66,14 @@ def check_files():
     required_files = [
         'app.py',
         'image_analysis.py',
+        'image_context.py',
+        'image_reader.py',
+        'feature_cache.py',
+        'job_queue.py',
+        'batch_analysis.py',
+        'calibration.py',
         'pm25_estimator.py',
+        'pm25_raster.py',
         'visualization.py',
         'requirements.txt',
         'templates/index.html',
@@ -9,12 +9,162 @@ Author: PM2.5 Estimation System
 import cv2
 import numpy as np
 import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+# Charts are drawn on Figure/FigureCanvasAgg objects owned by one thread;
+# pyplot and its global figure registry are never used, so request
+# threads of a gthread worker can render concurrently
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from datetime import datetime
+from functools import lru_cache
 import os
 import csv
-from typing import Dict, Tuple, List
+import tempfile
+import threading
+from PIL import Image, ImageDraw, ImageFont
+from typing import Dict, Tuple, List, Union
+
+from image_context import ImageContext
+
+
+# Anything an image visualization accepts: a path, a decoded BGR array,
+# or a shared ImageContext
+ImageSource = Union[str, np.ndarray, ImageContext]
+
+# Text drawn straight into image arrays uses matplotlib's bundled DejaVu
+# Sans, so it matches the matplotlib charts (and has µ and ³ glyphs)
+_FONT_DIR = os.path.join(matplotlib.get_data_path(), 'fonts', 'ttf')
+
+# Guards FreeType rendering (PIL fonts are shared) and the history file
+_text_lock = threading.Lock()
+_history_lock = threading.Lock()
+
+# Per-thread OpenCV helper objects and chart templates (see _clahe and
+# PM25Visualizer._timeseries_template); neither is safe to share between threads
+_thread_state = threading.local()
+
+
+@lru_cache(maxsize=None)
+def _font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
+    """Load (once) the font used for array-rendered text."""
+    name = 'DejaVuSans-Bold.ttf' if bold else 'DejaVuSans.ttf'
+    try:
+        return ImageFont.truetype(os.path.join(_FONT_DIR, name), size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=1024)
+def _text_mask(text: str, size: int, bold: bool = False) -> np.ndarray:
+    """
+    Anti-aliased coverage mask of a text line, cached because titles,
+    tick labels and captions repeat from request to request.
+    
+    Args:
+        text: Text to render
+        size: Font size in pixels
+        bold: Use the bold face
+        
+    Returns:
+        np.ndarray: Read-only (H, W) uint8 mask, H = font ascent + descent
+    """
+    font = _font(size, bold)
+    ascent, descent = font.getmetrics()
+    with _text_lock:
+        mask = Image.new('L', (int(np.ceil(font.getlength(text))) + 1, ascent + descent), 0)
+        ImageDraw.Draw(mask).text((0, 0), text, fill=255, font=font)
+    
+    mask = np.asarray(mask)
+    mask.flags.writeable = False
+    return mask
+
+
+def _draw_text(canvas: np.ndarray, text: str, x: int, y: int, size: int,
+               color: Tuple[int, int, int] = (0, 0, 0), bold: bool = False,
+               anchor: str = 'lt', vertical: bool = False) -> None:
+    """
+    Blend text into a BGR image in place.
+    
+    Args:
+        canvas: uint8 BGR image to draw on
+        text: Text to draw
+        x, y: Anchor position in pixels
+        size: Font size in pixels
+        color: BGR text color
+        bold: Use the bold face
+        anchor: Horizontal ('l', 'm', 'r') + vertical ('t', 'm', 'b') anchor
+        vertical: Rotate 90° clockwise (reads top to bottom)
+    """
+    mask = _text_mask(text, size, bold)
+    if vertical:
+        mask = np.rot90(mask, -1)
+    height, width = mask.shape
+    
+    left = x - {'l': 0, 'm': width // 2, 'r': width}[anchor[0]]
+    top = y - {'t': 0, 'm': height // 2, 'b': height}[anchor[1]]
+    
+    # Clip to the canvas
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + width, canvas.shape[1]), min(top + height, canvas.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    
+    alpha = mask[y0 - top:y1 - top, x0 - left:x1 - left, None].astype(np.float32) / 255
+    region = canvas[y0:y1, x0:x1]
+    region[:] = region + (np.asarray(color, dtype=np.float32) - region) * alpha
+
+
+def _nice_ticks(vmax: float, max_ticks: int = 7) -> np.ndarray:
+    """
+    Round tick values from 0 to vmax (steps of 1, 2, 2.5 or 5 x 10^k).
+    
+    Args:
+        vmax: Top of the scale
+        max_ticks: Maximum number of intervals
+        
+    Returns:
+        np.ndarray: Tick values
+    """
+    magnitude = 10 ** np.floor(np.log10(vmax / max_ticks))
+    for multiple in (1, 2, 2.5, 5, 10):
+        step = multiple * magnitude
+        if vmax / step <= max_ticks:
+            break
+    
+    return np.arange(0, vmax + step * 1e-9, step)
+
+
+def _clahe() -> cv2.CLAHE:
+    """
+    CLAHE operator for the before/after view, created once per thread
+    (OpenCV algorithm objects keep scratch buffers, so they are not
+    shared between request threads).
+    """
+    clahe = getattr(_thread_state, 'clahe', None)
+    if clahe is None:
+        clahe = _thread_state.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+    return clahe
+
+
+def _write_png(image: np.ndarray, output_path: str) -> str:
+    """
+    Encode a BGR image as PNG with OpenCV and write it in one call.
+    
+    Args:
+        image: uint8 BGR image
+        output_path: Destination file
+        
+    Returns:
+        str: output_path
+    """
+    # Fast zlib level: these images are served once and rarely kept
+    ok, encoded = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        raise ValueError(f"Failed to encode {output_path}")
+    
+    with open(output_path, 'wb') as f:
+        f.write(encoded.tobytes())
+    
+    return output_path
 
 
 class PM25Visualizer:
@@ -22,6 +172,35 @@ class PM25Visualizer:
     Creates visualizations for PM2.5 estimation results.
     """
     
+    # Standard (width, height) of image-based visualizations
+    IMAGE_SIZE = ImageContext.TARGET_SIZE
+    
+    # (columns, rows) of the downsampled heatmap grid served as JSON
+    HEATMAP_GRID_SIZE = (40, 30)
+    
+    # AQI zones shaded behind the time series: (low, high, color, label)
+    AQI_BANDS = (
+        (0, 12, 'green', 'Good'),
+        (12, 35.4, 'yellow', 'Moderate'),
+        (35.4, 55.4, 'orange', 'Unhealthy (Sensitive)'),
+        (55.4, 150, 'red', 'Unhealthy'),
+        (150, 300, 'purple', 'Very Unhealthy')
+    )
+    
+    # Bars of the feature chart, in order
+    FEATURE_CHART_LABELS = (
+        'Haze\nScore',
+        'Turbidity',
+        'Visibility',
+        'Contrast',
+        'Brightness\n(norm)',
+        'Saturation\n(norm)'
+    )
+    FEATURE_CHART_COLORS = ('#FF6B6B', '#FFA07A', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7')
+    
+    # Measurements kept in the history file
+    HISTORY_LENGTH = 30
+    
     def __init__(self, results_dir: str = 'static/results'):
         """
         Initialize visualizer.
@@ -31,98 +210,204 @@ class PM25Visualizer:
         """
         self.results_dir = results_dir
         os.makedirs(results_dir, exist_ok=True)
+    
+    def _load_context(self, image: ImageSource) -> ImageContext:
+        """
+        Get an image context at the standard visualization size.
+        
+        Args:
+            image: Path to the image, decoded BGR array or ImageContext
+            
+        Returns:
+            ImageContext: Context whose views can be shared between outputs
+        """
+        if isinstance(image, ImageContext):
+            return image
+        
+        if isinstance(image, str):
+            return ImageContext.from_path(image, target_size=self.IMAGE_SIZE)
         
-        # Set matplotlib style for better-looking plots
-        plt.rcParams['figure.facecolor'] = 'white'
+        return ImageContext(image, self.IMAGE_SIZE)
     
-    def create_heatmap(self, image_path: str, pm25_value: float, 
-                      output_name: str = 'heatmap.png') -> str:
+    def create_heatmap(self, image: ImageSource, pm25_value: float, 
+                      output_name: str = 'heatmap.png',
+                      pm25_grid: np.ndarray = None) -> str:
         """
         Create a PM2.5 concentration heatmap overlay on the satellite image.
         
         Args:
-            image_path: Path to original satellite image
+            image: Path to original satellite image, decoded BGR array
+                   or shared ImageContext
             pm25_value: Estimated PM2.5 concentration
             output_name: Name for output file
+            pm25_grid: Optional PM2.5 raster (e.g. from RasterEstimator);
+                       when given it is drawn instead of the intensity proxy
             
         Returns:
             str: Path to saved heatmap image
         """
         # Load image
-        image = cv2.imread(image_path)
-        image = cv2.resize(image, (800, 600))
-        
-        # Create heatmap based on image intensity and PM2.5 value
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        context = self._load_context(image)
+        image = context.bgr
         
-        # Invert and normalize - darker areas = higher pollution
-        heatmap_data = 255 - gray
-        heatmap_data = cv2.GaussianBlur(heatmap_data, (21, 21), 0)
-        
-        # Normalize to PM2.5 scale
-        heatmap_data = (heatmap_data / 255.0) * pm25_value
+        intensity, scale_max = self._heatmap_intensity(context, pm25_value, pm25_grid)
         
         # Create colormap
         # Blue (low) -> Green -> Yellow -> Red (high)
-        heatmap_colored = cv2.applyColorMap(
-            (heatmap_data / max(pm25_value, 1) * 255).astype(np.uint8),
-            cv2.COLORMAP_JET
-        )
+        heatmap_colored = cv2.applyColorMap(intensity, cv2.COLORMAP_JET)
         
         # Blend with original image
         overlay = cv2.addWeighted(image, 0.6, heatmap_colored, 0.4, 0)
         
-        # Add colorbar
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6), 
-                                       gridspec_kw={'width_ratios': [20, 1]})
+        # Title, overlay and colorbar are composed directly in the array
+        figure = self._compose_heatmap(
+            overlay, f'PM2.5 Spatial Distribution (Est. {pm25_value:.1f} µg/m³)', scale_max
+        )
+        
+        # Save
+        return _write_png(figure, os.path.join(self.results_dir, output_name))
+    
+    def _heatmap_intensity(self, context: ImageContext, pm25_value: float,
+                           pm25_grid: np.ndarray = None) -> Tuple[np.ndarray, float]:
+        """
+        Per-pixel heatmap intensity, shared by the PNG heatmap and its grid.
+        
+        Args:
+            context: Image context at the visualization size
+            pm25_value: Estimated PM2.5 concentration
+            pm25_grid: Optional PM2.5 raster drawn instead of the intensity proxy
+            
+        Returns:
+            tuple: (uint8 intensity where 255 = scale_max, scale_max in µg/m³)
+        """
+        if pm25_grid is not None:
+            # Real per-window estimates, smoothly upsampled to the image
+            heatmap_data = cv2.resize(
+                np.asarray(pm25_grid, dtype=np.float32), context.size,
+                interpolation=cv2.INTER_LINEAR
+            )
+            scale_max = max(float(np.max(pm25_grid)), 1)
+            
+            # Map 0..scale_max to 0..255 (saturating, no float64 temporaries)
+            intensity = cv2.convertScaleAbs(heatmap_data, alpha=255 / scale_max)
+        else:
+            # Create heatmap based on image intensity and PM2.5 value
+            gray = context.gray
+            
+            # Invert and normalize - darker areas = higher pollution
+            heatmap_data = 255 - gray
+            heatmap_data = cv2.GaussianBlur(heatmap_data, (21, 21), 0)
+            
+            # Normalize to PM2.5 scale: (blurred / 255 * pm25) / scale_max * 255
+            scale_max = max(pm25_value, 1)
+            intensity = cv2.convertScaleAbs(heatmap_data, alpha=pm25_value / scale_max)
+        
+        return intensity, scale_max
+    
+    def heatmap_grid(self, image: ImageSource, pm25_value: float,
+                     pm25_grid: np.ndarray = None) -> Dict[str, object]:
+        """
+        Downsampled PM2.5 heatmap values for client-side rendering.
         
-        # Display overlay
-        ax1.imshow(cv2.cvtColor(overlay, cv2.COLOR_BGR2RGB))
-        ax1.set_title(f'PM2.5 Spatial Distribution (Est. {pm25_value:.1f} µg/m³)', 
-                     fontsize=14, fontweight='bold')
-        ax1.axis('off')
+        Args:
+            image: Path to original satellite image, decoded BGR array
+                   or shared ImageContext
+            pm25_value: Estimated PM2.5 concentration
+            pm25_grid: Optional PM2.5 raster (e.g. from RasterEstimator)
+            
+        Returns:
+            dict: Grid columns, rows, colorbar maximum and row-major
+                  PM2.5 values (µg/m³, one decimal)
+        """
+        context = self._load_context(image)
+        intensity, scale_max = self._heatmap_intensity(context, pm25_value, pm25_grid)
         
-        # Add colorbar
-        norm = plt.Normalize(vmin=0, vmax=pm25_value)
-        sm = plt.cm.ScalarMappable(cmap='jet', norm=norm)
-        sm.set_array([])
-        cbar = plt.colorbar(sm, cax=ax2)
-        cbar.set_label('PM2.5 (µg/m³)', rotation=270, labelpad=20, fontsize=11)
+        cells = cv2.resize(intensity, self.HEATMAP_GRID_SIZE, interpolation=cv2.INTER_AREA)
+        values = np.round(cells * (scale_max / 255), 1)  # float64: short JSON numbers
         
-        plt.tight_layout()
+        return {
+            'columns': self.HEATMAP_GRID_SIZE[0],
+            'rows': self.HEATMAP_GRID_SIZE[1],
+            'scale_max': round(float(scale_max), 2),
+            'values': values.tolist()
+        }
+    
+    def _compose_heatmap(self, overlay: np.ndarray, title: str,
+                         scale_max: float) -> np.ndarray:
+        """
+        Lay out the heatmap figure: bold title, overlay and a jet colorbar
+        with ticks and a rotated unit label, on a white background.
         
-        # Save
-        output_path = os.path.join(self.results_dir, output_name)
-        plt.savefig(output_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        Args:
+            overlay: BGR heatmap overlay
+            title: Title text
+            scale_max: PM2.5 value at the top of the colorbar
+            
+        Returns:
+            np.ndarray: BGR figure
+        """
+        height, width = overlay.shape[:2]
+        margin, title_band = 16, 44
+        bar_gap, bar_width, tick_length = 28, 26, 5
+        tick_size, label_size, title_size = 14, 16, 22
+        
+        ticks = _nice_ticks(scale_max)
+        tick_labels = [f'{tick:g}' for tick in ticks]
+        tick_width = max(_text_mask(label, tick_size).shape[1] for label in tick_labels)
+        label_height = _text_mask('PM2.5 (µg/m³)', label_size).shape[0]
+        
+        bar_left = margin + width + bar_gap
+        canvas_width = bar_left + bar_width + tick_length + 4 + tick_width + 14 + label_height + margin
+        top = title_band + margin // 2
+        canvas = np.full((top + height + margin, canvas_width, 3), 255, dtype=np.uint8)
+        
+        canvas[top:top + height, margin:margin + width] = overlay
+        _draw_text(canvas, title, margin + width // 2, title_band // 2 + 4, title_size,
+                   bold=True, anchor='mm')
+        
+        # Colorbar: the same OpenCV jet map as the overlay, high values on top
+        gradient = np.linspace(255, 0, height).astype(np.uint8)[:, None]
+        canvas[top:top + height, bar_left:bar_left + bar_width] = cv2.applyColorMap(
+            np.repeat(gradient, bar_width, axis=1), cv2.COLORMAP_JET
+        )
+        cv2.rectangle(canvas, (bar_left, top), (bar_left + bar_width - 1, top + height - 1),
+                      (0, 0, 0), 1)
+        
+        bar_right = bar_left + bar_width
+        for tick, label in zip(ticks, tick_labels):
+            y = top + int(round((1 - tick / scale_max) * (height - 1)))
+            cv2.line(canvas, (bar_right, y), (bar_right + tick_length, y), (0, 0, 0), 1)
+            _draw_text(canvas, label, bar_right + tick_length + 4, y, tick_size, anchor='lm')
         
-        return output_path
+        _draw_text(canvas, 'PM2.5 (µg/m³)', canvas_width - margin, top + height // 2,
+                   label_size, anchor='rm', vertical=True)
+        
+        return canvas
     
-    def create_before_after(self, image_path: str, 
+    def create_before_after(self, image: ImageSource, 
                            output_name: str = 'before_after.png') -> str:
         """
         Create before/after pollution visualization.
         Before = original, After = contrast-enhanced (simulating reduced pollution)
         
         Args:
-            image_path: Path to original satellite image
+            image: Path to original satellite image, decoded BGR array
+                   or shared ImageContext
             output_name: Name for output file
             
         Returns:
             str: Path to saved comparison image
         """
         # Load image
-        image = cv2.imread(image_path)
-        image = cv2.resize(image, (800, 600))
+        context = self._load_context(image)
+        image = context.bgr
         
         # Create "after" version with enhanced clarity
         # Simulates what the area would look like with less pollution
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
+        l, a, b = cv2.split(context.lab)
         
         # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        l_enhanced = clahe.apply(l)
+        l_enhanced = _clahe().apply(l)
         
         # Merge channels
         enhanced = cv2.merge([l_enhanced, a, b])
@@ -133,45 +418,63 @@ class PM25Visualizer:
         hsv[:, :, 1] = cv2.add(hsv[:, :, 1], 30)
         enhanced = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
         
-        # Create side-by-side comparison
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-        
-        # Before
-        ax1.imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-        ax1.set_title('Current Conditions\n(With Pollution)', 
-                     fontsize=13, fontweight='bold')
-        ax1.axis('off')
-        
-        # After
-        ax2.imshow(cv2.cvtColor(enhanced, cv2.COLOR_BGR2RGB))
-        ax2.set_title('Simulated Clear Conditions\n(Reduced Pollution)', 
-                     fontsize=13, fontweight='bold')
-        ax2.axis('off')
-        
-        plt.tight_layout()
+        # Side-by-side comparison, composed directly in the array
+        figure = self._compose_side_by_side(
+            (image, enhanced),
+            (('Current Conditions', '(With Pollution)'),
+             ('Simulated Clear Conditions', '(Reduced Pollution)'))
+        )
         
         # Save
-        output_path = os.path.join(self.results_dir, output_name)
-        plt.savefig(output_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        return _write_png(figure, os.path.join(self.results_dir, output_name))
+    
+    def _compose_side_by_side(self, panels: Tuple[np.ndarray, np.ndarray],
+                              titles: Tuple[Tuple[str, ...], Tuple[str, ...]]) -> np.ndarray:
+        """
+        Lay out two equally sized images next to each other on a white
+        background, each under a bold (possibly multi-line) title.
         
-        return output_path
+        Args:
+            panels: Left and right BGR images of the same shape
+            titles: Title lines for the left and right panel
+            
+        Returns:
+            np.ndarray: BGR figure
+        """
+        height, width = panels[0].shape[:2]
+        margin, gap, title_size = 16, 24, 20
+        line_height = _text_mask(titles[0][0], title_size, True).shape[0]
+        top = margin + line_height * max(len(lines) for lines in titles) + margin // 2
+        
+        # White separators are concatenated in rather than painted over a canvas
+        def blank(rows: int, cols: int) -> np.ndarray:
+            return np.full((rows, cols, 3), 255, dtype=np.uint8)
+        
+        figure = np.vstack([
+            blank(top, 2 * width + gap + 2 * margin),
+            np.hstack([blank(height, margin), panels[0], blank(height, gap),
+                       panels[1], blank(height, margin)]),
+            blank(margin, 2 * width + gap + 2 * margin)
+        ])
+        
+        for index, lines in enumerate(titles):
+            center = margin + index * (width + gap) + width // 2
+            for row, line in enumerate(lines):
+                _draw_text(figure, line, center, margin + row * line_height, title_size,
+                           bold=True, anchor='mt')
+        
+        return figure
     
-    def create_timeseries_graph(self, current_pm25: float, 
-                               history_file: str = 'data/pm25_history.csv',
-                               output_name: str = 'timeseries.png') -> str:
+    def load_history(self, history_file: str = 'data/pm25_history.csv') -> Tuple[List[str], List[float]]:
         """
-        Create date-wise PM2.5 time series graph.
+        Read the PM2.5 measurement history.
         
         Args:
-            current_pm25: Current PM2.5 estimate to add
             history_file: Path to CSV file with historical data
-            output_name: Name for output file
             
         Returns:
-            str: Path to saved graph
+            tuple: (measurement dates, PM2.5 values), oldest first
         """
-        # Load or create history
         dates = []
         pm25_values = []
         
@@ -185,37 +488,122 @@ class PM25Visualizer:
             except Exception as e:
                 print(f"Error reading history file: {e}")
         
-        # Add current measurement
-        current_date = datetime.now().strftime('%Y-%m-%d %H:%M')
-        dates.append(current_date)
-        pm25_values.append(float(current_pm25))
+        return dates, pm25_values
+    
+    def record_history(self, current_pm25: float,
+                       history_file: str = 'data/pm25_history.csv') -> Tuple[List[str], List[float]]:
+        """
+        Append a measurement to the history file, keeping the latest ones.
         
-        # Keep only last 30 measurements
-        if len(dates) > 30:
-            dates = dates[-30:]
-            pm25_values = pm25_values[-30:]
+        Args:
+            current_pm25: Current PM2.5 estimate to add
+            history_file: Path to CSV file with historical data
+            
+        Returns:
+            tuple: (measurement dates, PM2.5 values) after the update
+        """
+        # One read-modify-write at a time within this process
+        with _history_lock:
+            dates, pm25_values = self.load_history(history_file)
+            
+            # Add current measurement
+            current_date = datetime.now().strftime('%Y-%m-%d %H:%M')
+            dates.append(current_date)
+            pm25_values.append(float(current_pm25))
+            
+            # Keep only last 30 measurements
+            if len(dates) > self.HISTORY_LENGTH:
+                dates = dates[-self.HISTORY_LENGTH:]
+                pm25_values = pm25_values[-self.HISTORY_LENGTH:]
+            
+            # Save updated history (renamed into place so readers never
+            # see a partially written file)
+            os.makedirs(os.path.dirname(history_file), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(history_file), suffix='.part')
+            with os.fdopen(fd, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['date', 'pm25'])
+                writer.writeheader()
+                for date, pm25 in zip(dates, pm25_values):
+                    writer.writerow({'date': date, 'pm25': pm25})
+            os.replace(temp_path, history_file)
+        
+        return dates, pm25_values
+    
+    def timeseries_data(self, dates: List[str], pm25_values: List[float]) -> Dict[str, object]:
+        """
+        Time series chart data for client-side rendering.
         
-        # Save updated history
-        os.makedirs(os.path.dirname(history_file), exist_ok=True)
-        with open(history_file, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=['date', 'pm25'])
-            writer.writeheader()
-            for date, pm25 in zip(dates, pm25_values):
-                writer.writerow({'date': date, 'pm25': pm25})
+        Args:
+            dates: Measurement dates, oldest first
+            pm25_values: PM2.5 values matching dates
+            
+        Returns:
+            dict: Dates, PM2.5 values and the AQI bands to shade
+        """
+        return {
+            'dates': list(dates),
+            'pm25': [float(value) for value in pm25_values],
+            'bands': [
+                {'low': low, 'high': high, 'color': color, 'label': label}
+                for low, high, color, label in self.AQI_BANDS
+            ]
+        }
+    
+    def create_timeseries_graph(self, current_pm25: float, 
+                               history_file: str = 'data/pm25_history.csv',
+                               output_name: str = 'timeseries.png') -> str:
+        """
+        Create date-wise PM2.5 time series graph.
         
-        # Create plot
-        fig, ax = plt.subplots(figsize=(12, 6))
+        Args:
+            current_pm25: Current PM2.5 estimate to add
+            history_file: Path to CSV file with historical data
+            output_name: Name for output file
+            
+        Returns:
+            str: Path to saved graph
+        """
+        dates, pm25_values = self.record_history(current_pm25, history_file)
+        
+        # Only the data artists change; axes, AQI bands and legend are reused
+        chart = self._timeseries_template()
+        
+        chart['line'].set_data(range(len(pm25_values)), pm25_values)
+        chart['ax'].relim()
+        chart['ax'].autoscale_view()
+        
+        # X-axis labels - show every 5th date if too many
+        step = max(1, len(dates) // 10) if len(dates) > 10 else 1
+        indices = range(0, len(dates), step)
+        chart['ax'].set_xticks(indices, [dates[i].split()[0] for i in indices],
+                               rotation=45, ha='right')
+        
+        # Save
+        return self._render_chart(chart, os.path.join(self.results_dir, output_name))
+    
+    def _timeseries_template(self) -> Dict[str, object]:
+        """
+        Time series chart with its static chrome (AQI bands, labels,
+        legend, layout), built once per thread and reused.
+        
+        Returns:
+            dict: Figure, canvas, axes and the PM2.5 line artist
+        """
+        chart = getattr(_thread_state, 'timeseries', None)
+        if chart is not None:
+            return chart
+        
+        fig = Figure(figsize=(12, 6), dpi=150, facecolor='white')
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
         
         # Plot line
-        ax.plot(range(len(pm25_values)), pm25_values, marker='o', linewidth=2, 
-               markersize=6, color='#2E86AB', label='PM2.5')
+        line, = ax.plot([], [], marker='o', linewidth=2,
+                        markersize=6, color='#2E86AB', label='PM2.5')
         
         # Color zones based on AQI categories
-        ax.axhspan(0, 12, alpha=0.1, color='green', label='Good')
-        ax.axhspan(12, 35.4, alpha=0.1, color='yellow', label='Moderate')
-        ax.axhspan(35.4, 55.4, alpha=0.1, color='orange', label='Unhealthy (Sensitive)')
-        ax.axhspan(55.4, 150, alpha=0.1, color='red', label='Unhealthy')
-        ax.axhspan(150, 300, alpha=0.1, color='purple', label='Very Unhealthy')
+        for low, high, color, label in self.AQI_BANDS:
+            ax.axhspan(low, high, alpha=0.1, color=color, label=label)
         
         # Styling
         ax.set_xlabel('Measurement Timeline', fontsize=12, fontweight='bold')
@@ -224,26 +612,13 @@ class PM25Visualizer:
         ax.grid(True, alpha=0.3)
         ax.legend(loc='upper left', fontsize=9)
         
-        # X-axis labels - show every 5th date if too many
-        if len(dates) > 10:
-            step = max(1, len(dates) // 10)
-            indices = range(0, len(dates), step)
-            ax.set_xticks(indices)
-            ax.set_xticklabels([dates[i].split()[0] for i in indices], 
-                              rotation=45, ha='right')
-        else:
-            ax.set_xticks(range(len(dates)))
-            ax.set_xticklabels([d.split()[0] for d in dates], 
-                              rotation=45, ha='right')
-        
-        plt.tight_layout()
-        
-        # Save
-        output_path = os.path.join(self.results_dir, output_name)
-        plt.savefig(output_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        # Lay out once with date labels of the width every request uses
+        ax.set_xticks(range(10), ['0000-00-00'] * 10, rotation=45, ha='right')
+        fig.tight_layout()
         
-        return output_path
+        chart = {'figure': fig, 'canvas': canvas, 'ax': ax, 'line': line}
+        _thread_state.timeseries = chart
+        return chart
     
     def create_feature_chart(self, features: Dict[str, float],
                            output_name: str = 'features.png') -> str:
@@ -257,19 +632,22 @@ class PM25Visualizer:
         Returns:
             str: Path to saved chart
         """
-        fig, ax = plt.subplots(figsize=(10, 6))
+        values = self._feature_chart_values(features)
         
-        # Prepare data
-        feature_names = [
-            'Haze\nScore',
-            'Turbidity',
-            'Visibility',
-            'Contrast',
-            'Brightness\n(norm)',
-            'Saturation\n(norm)'
-        ]
+        # Only bar heights and value labels change between requests
+        chart = self._feature_template()
+        
+        for bar, label, val in zip(chart['bars'], chart['labels'], values):
+            bar.set_height(val)
+            label.set_y(val)
+            label.set_text(f'{val:.1f}')
         
-        values = [
+        # Save
+        return self._render_chart(chart, os.path.join(self.results_dir, output_name))
+    
+    def _feature_chart_values(self, features: Dict[str, float]) -> List[float]:
+        """Bar heights of the feature chart (brightness/saturation as % of 255)."""
+        return [
             features.get('haze_score', 0),
             features.get('turbidity', 0),
             features.get('visibility', 0),
@@ -277,49 +655,97 @@ class PM25Visualizer:
             (features.get('brightness', 128) / 255) * 100,
             (features.get('saturation', 128) / 255) * 100
         ]
+    
+    def feature_chart_data(self, features: Dict[str, float]) -> Dict[str, object]:
+        """
+        Feature chart data for client-side rendering.
+        
+        Args:
+            features: Dictionary of atmospheric features
+            
+        Returns:
+            dict: Bar labels, values (0-100 scale, two decimals) and colors
+        """
+        return {
+            'labels': [label.replace('\n', ' ') for label in self.FEATURE_CHART_LABELS],
+            'values': [round(float(value), 2) for value in self._feature_chart_values(features)],
+            'colors': list(self.FEATURE_CHART_COLORS)
+        }
+    
+    def _feature_template(self) -> Dict[str, object]:
+        """
+        Feature bar chart with its static chrome (names, colors, labels,
+        layout), built once per thread and reused.
         
-        colors = ['#FF6B6B', '#FFA07A', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
+        Returns:
+            dict: Figure, canvas, axes, bar artists and value label artists
+        """
+        chart = getattr(_thread_state, 'features', None)
+        if chart is not None:
+            return chart
+        
+        fig = Figure(figsize=(10, 6), dpi=150, facecolor='white')
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
         
         # Create bar chart
-        bars = ax.bar(feature_names, values, color=colors, alpha=0.8, edgecolor='black')
+        bars = ax.bar(self.FEATURE_CHART_LABELS, [0] * len(self.FEATURE_CHART_LABELS),
+                      color=self.FEATURE_CHART_COLORS, alpha=0.8, edgecolor='black')
         
-        # Add value labels on bars
-        for bar, val in zip(bars, values):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{val:.1f}',
+        # Value labels on bars, moved and rewritten per request
+        labels = [
+            ax.text(bar.get_x() + bar.get_width()/2., 0, '',
                    ha='center', va='bottom', fontweight='bold')
+            for bar in bars
+        ]
         
         ax.set_ylabel('Score (0-100)', fontsize=12, fontweight='bold')
         ax.set_title('Atmospheric Feature Analysis', fontsize=14, fontweight='bold', pad=20)
         ax.set_ylim(0, 110)
         ax.grid(axis='y', alpha=0.3)
         
-        plt.tight_layout()
+        fig.tight_layout()
         
-        # Save
-        output_path = os.path.join(self.results_dir, output_name)
-        plt.savefig(output_path, dpi=150, bbox_inches='tight')
-        plt.close()
+        chart = {'figure': fig, 'canvas': canvas, 'ax': ax, 'bars': bars, 'labels': labels}
+        _thread_state.features = chart
+        return chart
+    
+    def _render_chart(self, chart: Dict[str, object], output_path: str) -> str:
+        """
+        Draw a chart template and save it as PNG.
         
-        return output_path
+        Args:
+            chart: Template from _timeseries_template or _feature_template
+            output_path: Destination file
+            
+        Returns:
+            str: output_path
+        """
+        chart['canvas'].draw()
+        rgba = np.asarray(chart['canvas'].buffer_rgba())
+        
+        return _write_png(cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR), output_path)
     
-    def create_all_visualizations(self, image_path: str, pm25_value: float, 
+    def create_all_visualizations(self, image: ImageSource, pm25_value: float, 
                                  features: Dict[str, float]) -> Dict[str, str]:
         """
         Create all visualizations at once.
         
         Args:
-            image_path: Path to original satellite image
+            image: Path to original satellite image, decoded BGR array
+                   or shared ImageContext
             pm25_value: Estimated PM2.5 concentration
             features: Atmospheric features
             
         Returns:
             dict: Paths to all generated visualizations
         """
+        # Decode once and share the context between both image outputs
+        image = self._load_context(image)
+        
         results = {
-            'heatmap': self.create_heatmap(image_path, pm25_value),
-            'before_after': self.create_before_after(image_path),
+            'heatmap': self.create_heatmap(image, pm25_value),
+            'before_after': self.create_before_after(image),
             'timeseries': self.create_timeseries_graph(pm25_value),
             'features': self.create_feature_chart(features)
         }